@@ -5,11 +5,72 @@ This provides a custom embedder that uses AWS Bedrock Titan Text Embeddings V2.
 """
 
 import json
+import asyncio
+import hashlib
+import math
+import threading
 import boto3
-from typing import List, Union
+from array import array
+from collections import OrderedDict
+from contextlib import closing
+from botocore.client import BaseClient
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 from agno.embedder.base import Embedder
 
 
+# Bedrock runtime clients shared across embedder instances, keyed by region and endpoint
+_CLIENT_CACHE: Dict[Tuple[str, Optional[str]], BaseClient] = {}
+
+
+def get_bedrock_client(region: str, endpoint_url: Optional[str] = None) -> BaseClient:
+    """Return the shared bedrock-runtime client for a region/endpoint, creating it once."""
+    key = (region, endpoint_url)
+    client = _CLIENT_CACHE.get(key)
+    if client is None:
+        client = _CLIENT_CACHE.setdefault(key, boto3.Session().client(
+            'bedrock-runtime',
+            region_name=region,
+            endpoint_url=endpoint_url,
+            config=Config(
+                max_pool_connections=32,
+                retries={'mode': 'adaptive', 'max_attempts': 5},
+                tcp_keepalive=True,
+                connect_timeout=5,
+                read_timeout=30
+            )
+        ))
+    return client
+
+
+def normalize_embedding(vector: List[float]) -> List[float]:
+    """Scale a vector to unit L2 norm in a single pass."""
+    norm = math.hypot(*vector)
+    if norm == 0.0:
+        return list(vector)
+    inv_norm = 1.0 / norm
+    return [x * inv_norm for x in vector]
+
+
+def trim_embedding(vector: List[float], digits: int = 8) -> List[float]:
+    """
+    Round vector components for transport to OpenSearch.
+    
+    Titan values unpacked from float32 serialize as 17+ significant digits in JSON;
+    for unit-length vectors 8 decimals (error <= 5e-9) keeps about float32 precision
+    at half the payload.
+    """
+    return [round(x, digits) for x in vector]
+
+
+def quantize_embedding(vector: List[float]) -> List[int]:
+    """Normalize and quantize a vector to int8 range in one pass (for byte k-NN indexes)."""
+    norm = math.hypot(*vector)
+    scale = 127.0 / norm if norm else 0.0
+    return [max(-128, min(127, round(x * scale))) for x in vector]
+
+
 class BedrockEmbedder(Embedder):
     """AWS Bedrock Titan Text Embeddings V2 embedder for Agno."""
     
@@ -17,8 +78,13 @@ class BedrockEmbedder(Embedder):
         self,
         model_id: str = "amazon.titan-embed-text-v2:0",
         region: str = "us-east-1",
+        endpoint_url: Optional[str] = None,
         dimensions: int = 1024,
         normalize: bool = True,
+        max_workers: int = 16,
+        cache_size: int = 8192,
+        max_batch: int = 64,
+        max_wait_ms: float = 8,
         **kwargs
     ):
         """
@@ -27,8 +93,13 @@ class BedrockEmbedder(Embedder):
         Args:
             model_id: Bedrock model ID for embeddings
             region: AWS region
+            endpoint_url: Optional bedrock-runtime endpoint (e.g. a VPC interface endpoint)
             dimensions: Output embedding dimensions (256, 512, or 1024)
-            normalize: Whether to normalize embeddings
+            normalize: Whether to normalize embeddings (done client-side)
+            max_workers: Maximum concurrent Bedrock requests for batched texts
+            cache_size: Number of embeddings kept in the in-process LRU cache
+            max_batch: Maximum texts coalesced into one async micro-batch
+            max_wait_ms: How long the async coalescer waits to fill a micro-batch
         """
         super().__init__(**kwargs)
         self.model_id = model_id
@@ -36,11 +107,25 @@ class BedrockEmbedder(Embedder):
         self.dimensions = dimensions
         self.normalize = normalize
         
-        # Initialize Bedrock client
-        self.bedrock_client = boto3.client(
-            'bedrock-runtime',
-            region_name=region
-        )
+        # Reuse the process-wide Bedrock client for this region
+        self.bedrock_client = get_bedrock_client(region, endpoint_url)
+        
+        # Titan v2 embeds one text per call, so batches fan out over a bounded pool
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        
+        # LRU of content hash -> packed embedding, so repeated chunks skip Bedrock
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, array]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Async micro-batching: concurrent aget_embedding callers share dispatch windows
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        # In-flight dispatches, referenced until done so they are not garbage-collected
+        self._dispatch_tasks: set = set()
     
     def get_embedding(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
         """
@@ -55,15 +140,38 @@ class BedrockEmbedder(Embedder):
         if isinstance(text, str):
             return self._get_single_embedding(text)
         else:
-            return [self._get_single_embedding(t) for t in text]
+            return list(self._executor.map(self._get_single_embedding, text))
     
     def _get_single_embedding(self, text: str) -> List[float]:
-        """Generate embedding for a single text."""
+        """Generate embedding for a single text, serving repeats from the LRU cache."""
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached.tolist()
+        
+        embedding = self._invoke_model(text)
+        if self.normalize:
+            embedding = normalize_embedding(embedding)
+        
+        # Titan returns float32 values; pack them as such (4 bytes per component)
+        packed = array('f', embedding)
+        
+        with self._cache_lock:
+            self._cache[key] = packed
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return packed.tolist()
+    
+    def _invoke_model(self, text: str) -> List[float]:
+        """Call Bedrock to embed a single text."""
         body = json.dumps({
             "inputText": text,
             "dimensions": self.dimensions,
-            "normalize": self.normalize
-        })
+            # Normalization happens client-side in _get_single_embedding
+            "normalize": False
+        }, separators=(',', ':'))
         
         try:
             response = self.bedrock_client.invoke_model(
@@ -73,14 +181,71 @@ class BedrockEmbedder(Embedder):
                 contentType="application/json"
             )
             
-            response_body = json.loads(response.get('body').read())
+            # json.loads decodes the raw bytes directly, no intermediate str;
+            # closing the stream hands the connection straight back to the pool
+            with closing(response['body']) as response_stream:
+                response_body = json.loads(response_stream.read())
             return response_body['embedding']
             
         except Exception as e:
             raise RuntimeError(f"Failed to generate embedding: {e}")
     
     async def aget_embedding(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
-        """Async version of get_embedding."""
-        # For now, we'll use the sync version
-        # In a production environment, you might want to use aioboto3
-        return self.get_embedding(text)
\ No newline at end of file
+        """Async version of get_embedding; concurrent callers are coalesced into micro-batches."""
+        if isinstance(text, str):
+            return (await self._coalesce([text]))[0]
+        return await self._coalesce(list(text))
+    
+    async def _coalesce(self, texts: List[str]) -> List[List[float]]:
+        """Queue texts for the batching worker and wait for their embeddings."""
+        loop = asyncio.get_running_loop()
+        if self._batch_queue is None or self._batch_loop is not loop:
+            self._batch_queue = asyncio.Queue()
+            self._batch_loop = loop
+            self._batch_task = loop.create_task(self._batch_worker(self._batch_queue))
+        
+        futures = []
+        for t in texts:
+            future = loop.create_future()
+            self._batch_queue.put_nowait((t, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+    
+    async def _batch_worker(self, queue: asyncio.Queue) -> None:
+        """Collect requests for up to max_wait_ms (or max_batch texts) and dispatch them together."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = loop.create_task(self._dispatch_batch(batch))
+            self._dispatch_tasks.add(task)
+            task.add_done_callback(self._dispatch_tasks.discard)
+    
+    async def _dispatch_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Embed one micro-batch on the thread pool; identical texts share a single request."""
+        waiters: Dict[str, List[asyncio.Future]] = {}
+        for t, future in batch:
+            waiters.setdefault(t, []).append(future)
+        
+        loop = asyncio.get_running_loop()
+        texts = list(waiters)
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, self._get_single_embedding, t) for t in texts),
+            return_exceptions=True
+        )
+        for t, result in zip(texts, results):
+            for future in waiters[t]:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,51 @@
+# bedrock_model.py
+"""
+AWS Bedrock chat model with prompt caching for Agno framework.
+Marks the static system prompt and tool definitions as Bedrock cache points
+so repeated agent turns reuse the cached prefix instead of re-processing it.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from agno.models.aws import AwsBedrock
+from agno.models.message import Message
+
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# Model families that support Bedrock prompt caching; other models reject cachePoint blocks
+PROMPT_CACHING_MODEL_PREFIXES = ("anthropic.claude", "amazon.nova")
+
+
+def supports_prompt_caching(model_id: str) -> bool:
+    """Whether a Bedrock model id (or cross-region inference profile id) supports prompt caching."""
+    # Inference profile ids carry a region prefix, e.g. "us.anthropic.claude-..."
+    base_id = model_id.split(".", 1)[1] if model_id.split(".", 1)[0] in ("us", "eu", "apac", "global") else model_id
+    return base_id.startswith(PROMPT_CACHING_MODEL_PREFIXES)
+
+
+@dataclass
+class CachingAwsBedrock(AwsBedrock):
+    """AwsBedrock that appends Converse cachePoint blocks after static request segments."""
+
+    # Only takes effect for models that support Bedrock prompt caching
+    prompt_caching: bool = True
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.prompt_caching and not supports_prompt_caching(self.id):
+            self.prompt_caching = False
+
+    def _format_messages(self, messages: List[Message]) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+        """Format messages, caching everything up to the end of the system prompt."""
+        formatted_messages, system_message = super()._format_messages(messages)
+        if self.prompt_caching and system_message:
+            system_message = system_message + [CACHE_POINT]
+        return formatted_messages, system_message
+
+    def _format_tools_for_request(self, tools: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Format tool specs, caching the (static per agent) tool definitions."""
+        parsed_tools = super()._format_tools_for_request(tools)
+        if self.prompt_caching and parsed_tools:
+            parsed_tools.append(CACHE_POINT)
+        return parsed_tools
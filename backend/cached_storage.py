@@ -0,0 +1,52 @@
+# cached_storage.py
+"""
+Amazon DocumentDB agent storage with an in-process session cache for Agno framework.
+Keeps recently used sessions in memory so consecutive turns of the same
+conversation skip the cross-region DocumentDB read. Invalidation is in-process
+(writes go through this storage), so the cache is only safe with one worker.
+"""
+
+from typing import Optional
+from agno.storage.agent.mongodb import MongoDbAgentStorage
+from agno.storage.session import Session
+from ttl_cache import TTLCache
+
+
+class CachedMongoDbAgentStorage(MongoDbAgentStorage):
+    """MongoDbAgentStorage with a write-through TTL cache in front of session reads."""
+
+    def __init__(self, *args, cache_size: int = 1024, cache_ttl: float = 30, **kwargs):
+        """
+        Initialize cached agent storage.
+
+        Args:
+            cache_size: Maximum number of sessions held in memory
+            cache_ttl: Seconds a cached session is served before re-reading DocumentDB
+        """
+        super().__init__(*args, **kwargs)
+        self._session_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def read(self, session_id: str, user_id: Optional[str] = None) -> Optional[Session]:
+        """Read a session, serving it from the cache when fresh."""
+        session = self._session_cache.get(session_id)
+        if session is not None and (user_id is None or session.user_id == user_id):
+            return session
+
+        session = super().read(session_id, user_id)
+        if session is not None:
+            self._session_cache.set(session_id, session)
+        return session
+
+    def upsert(self, session: Session, create_and_retry: bool = True) -> Optional[Session]:
+        """Write a session through to DocumentDB and refresh its cache entry."""
+        self._session_cache.pop(session.session_id)
+        result = super().upsert(session, create_and_retry=create_and_retry)
+        if result is not None:
+            self._session_cache.set(session.session_id, result)
+        return result
+
+    def delete_session(self, session_id: Optional[str] = None) -> None:
+        """Delete a session and drop it from the cache."""
+        super().delete_session(session_id)
+        if session_id is not None:
+            self._session_cache.pop(session_id)
@@ -1,17 +1,17 @@
 # config.py - Updated for Bedrock API key authentication with GPT-OSS-120B only
 import os
 import logging
+from dataclasses import dataclass, fields, replace
+from typing import Final, Optional
 from dotenv import load_dotenv
-from agno.models.aws import AwsBedrock
-from agno.storage.agent.mongodb import MongoDbAgentStorage
+from pymongo import MongoClient
+from bedrock_model import CachingAwsBedrock
+from cached_storage import CachedMongoDbAgentStorage
 from agno.memory.v2.db.mongodb import MongoMemoryDb
-from agno.memory.v2.memory import Memory
+from rolling_memory import RollingSummaryMemory
 from aws_embedder import BedrockEmbedder
 from opensearch_vectordb import OpenSearchVectorDb
-from agno.knowledge.combined import CombinedKnowledgeBase
-from agno.knowledge.pdf import PDFKnowledgeBase
-from agno.knowledge.text import TextKnowledgeBase
-from agno.knowledge.docx import DocxKnowledgeBase
+from unified_knowledge import UnifiedKnowledgeBase
 
 load_dotenv()
 
@@ -19,38 +19,147 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# --- Multi-Region AWS Configuration ---
+# --- Settings ---
 
-# Primary regions for each service
-AWS_REGION = os.getenv("AWS_REGION", "ap-southeast-1")  # Singapore for OpenSearch
-AWS_BEDROCK_REGION = os.getenv("AWS_BEDROCK_REGION", "us-west-2")  # Oregon for Bedrock
-AWS_DOCUMENTDB_REGION = os.getenv("AWS_DOCUMENTDB_REGION", "ap-southeast-1")  # Singapore for DocumentDB
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Typed application settings, read from the environment and validated once at import."""
 
-# AWS Credentials (for OpenSearch and DocumentDB)
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+    # Primary regions for each service
+    aws_region: str = "ap-southeast-1"  # Singapore for OpenSearch
+    aws_bedrock_region: str = "us-west-2"  # Oregon for Bedrock
+    aws_documentdb_region: str = "ap-southeast-1"  # Singapore for DocumentDB
+    # Embeddings run next to OpenSearch so the embed -> index hop stays in-region (defaults to aws_region)
+    aws_embedding_region: Optional[str] = None  # Singapore for Titan embeddings
+    # Optional bedrock-runtime VPC interface endpoint (PrivateLink) for embedding traffic
+    bedrock_endpoint_url: Optional[str] = None
 
-# AWS Bedrock API Key (for GPT-OSS models)
-AWS_BEARER_TOKEN_BEDROCK = os.getenv("AWS_BEARER_TOKEN_BEDROCK")
+    # AWS Credentials (for OpenSearch and DocumentDB)
+    aws_access_key_id: Optional[str] = None
+    aws_secret_access_key: Optional[str] = None
 
-# Amazon DocumentDB configuration (Singapore region)
-DOCUMENTDB_URL = os.getenv("DOCUMENTDB_URL")
-DATABASE_NAME = os.getenv("DATABASE_NAME", "legal_agent_system")
+    # AWS Bedrock API Key (for GPT-OSS models)
+    aws_bearer_token_bedrock: Optional[str] = None
 
-# Amazon OpenSearch Service configuration (Singapore region)
-OPENSEARCH_ENDPOINT = os.getenv("OPENSEARCH_ENDPOINT")
-OPENSEARCH_INDEX = os.getenv("OPENSEARCH_INDEX", "legalknowledge")
-OPENSEARCH_USERNAME = os.getenv("OPENSEARCH_USERNAME", "Admin@123")
-OPENSEARCH_PASSWORD = os.getenv("OPENSEARCH_PASSWORD", "Admin@123")
+    # Amazon DocumentDB configuration (Singapore region)
+    documentdb_url: Optional[str] = None
+    database_name: str = "legal_agent_system"
 
-# Knowledge base directory
-KNOWLEDGE_BASE_DIR = os.getenv("KNOWLEDGE_BASE_DIR", "./knowledge_base")
+    # Amazon OpenSearch Service configuration (Singapore region)
+    opensearch_endpoint: Optional[str] = None
+    opensearch_index: str = "legalknowledge"
+    opensearch_username: str = "Admin@123"
+    opensearch_password: str = "Admin@123"
+    # Vector field type for new agent knowledge indexes: "float", or "byte" for int8 vectors (OpenSearch 2.17+).
+    # Only "float" is accepted while the index is shared with the knowledge manager and seed script,
+    # which write and query float vectors
+    opensearch_vector_data_type: str = "float"
+    # Shard routing: agent knowledge by this metadata field, uploaded documents by category.
+    # Only enable on a fresh (or fully reindexed) index; unrouted documents are not found by routed searches.
+    opensearch_routing_field: Optional[str] = None
+    knowledge_routing_by_category: bool = False
 
-# GPT-OSS-120B Model - Only model you need!
-BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "openai.gpt-oss-120b-1:0")
+    # Knowledge base directory
+    knowledge_base_dir: str = "./knowledge_base"
+
+    # GPT-OSS-120B Model - Only model you need!
+    bedrock_model_id: str = "openai.gpt-oss-120b-1:0"
+    # Bedrock inference latency profile: "standard", or "optimized" for models and regions that offer
+    # latency-optimized inference (GPT-OSS-120B in us-west-2 does not)
+    bedrock_latency_mode: str = "standard"
+    # Bedrock prompt caching of the static system prompt and tool definitions
+    # (only applied to models that support it, e.g. Claude and Nova; not GPT-OSS)
+    bedrock_prompt_caching: bool = True
+
+    # Conversation context: the newest runs go in verbatim, older ones only via the session summary
+    agent_history_runs: int = 1
+    # Runs between session summary refreshes (the summary is part of the cached prompt prefix)
+    session_summary_interval: int = 3
+
+    # Embedding model for uploaded knowledge documents and searches
+    # (amazon.titan-embed-text-v2:0, or cohere.embed-english-v3 / cohere.embed-multilingual-v3 to batch 96 texts per call)
+    embedding_model_id: str = "amazon.titan-embed-text-v2:0"
+    # Concurrent Bedrock InvokeModel calls per process when embedding uploads (respect TPS quotas)
+    max_parallel_embeddings: int = 16
+    # Background workers indexing uploaded documents (0 indexes uploads inline)
+    ingest_workers: int = 2
+    # uvicorn worker processes. Keep 1: the session and knowledge search result caches are per
+    # process, so with more workers they are disabled (a worker would not see another's writes)
+    web_concurrency: int = 1
+    # Threads for agent runs and blocking client calls made from request handlers
+    worker_threads: int = 64
+    # Requests declaring a larger body are rejected with 413 before it is read
+    max_upload_bytes: int = 100 * 1024 * 1024
+
+    # Knowledge search
+    max_search_results: int = 5
+    search_similarity_threshold: float = 0.7
+
+    # Frontend URL for CORS
+    frontend_url: str = "http://localhost:3000"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from upper-cased environment variables, coercing to the field types."""
+        values = {}
+        for field in fields(cls):
+            raw = os.getenv(field.name.upper())
+            if raw is None:
+                continue
+            try:
+                if field.type is bool:
+                    values[field.name] = raw.strip().lower() in ("1", "true", "yes", "on")
+                elif field.type in (int, float):
+                    values[field.name] = field.type(raw)
+                else:
+                    values[field.name] = raw
+            except ValueError:
+                raise ValueError(f"Invalid value for {field.name.upper()}: {raw!r}")
+
+        settings = cls(**values)
+        if settings.opensearch_vector_data_type != "float":
+            raise ValueError(
+                f"Invalid value for OPENSEARCH_VECTOR_DATA_TYPE: {settings.opensearch_vector_data_type!r} "
+                f"(only 'float' is supported while {settings.opensearch_index} is shared with the knowledge manager)"
+            )
+        if settings.aws_embedding_region is None:
+            settings = replace(settings, aws_embedding_region=settings.aws_region)
+        return settings
+
+
+SETTINGS: Final[Settings] = Settings.from_env()
+
+# Module-level aliases used throughout the backend
+AWS_REGION = SETTINGS.aws_region
+AWS_BEDROCK_REGION = SETTINGS.aws_bedrock_region
+AWS_DOCUMENTDB_REGION = SETTINGS.aws_documentdb_region
+AWS_EMBEDDING_REGION = SETTINGS.aws_embedding_region
+BEDROCK_ENDPOINT_URL = SETTINGS.bedrock_endpoint_url
+AWS_ACCESS_KEY_ID = SETTINGS.aws_access_key_id
+AWS_SECRET_ACCESS_KEY = SETTINGS.aws_secret_access_key
+AWS_BEARER_TOKEN_BEDROCK = SETTINGS.aws_bearer_token_bedrock
+DOCUMENTDB_URL = SETTINGS.documentdb_url
+DATABASE_NAME = SETTINGS.database_name
+OPENSEARCH_ENDPOINT = SETTINGS.opensearch_endpoint
+OPENSEARCH_INDEX = SETTINGS.opensearch_index
+OPENSEARCH_USERNAME = SETTINGS.opensearch_username
+OPENSEARCH_PASSWORD = SETTINGS.opensearch_password
+OPENSEARCH_VECTOR_DATA_TYPE = SETTINGS.opensearch_vector_data_type
+OPENSEARCH_ROUTING_FIELD = SETTINGS.opensearch_routing_field
+KNOWLEDGE_ROUTING_BY_CATEGORY = SETTINGS.knowledge_routing_by_category
+KNOWLEDGE_BASE_DIR = SETTINGS.knowledge_base_dir
+BEDROCK_MODEL_ID = SETTINGS.bedrock_model_id
+BEDROCK_LATENCY_MODE = SETTINGS.bedrock_latency_mode
+BEDROCK_PROMPT_CACHING = SETTINGS.bedrock_prompt_caching
+AGENT_HISTORY_RUNS = SETTINGS.agent_history_runs
+SESSION_SUMMARY_INTERVAL = SETTINGS.session_summary_interval
+EMBEDDING_MODEL_ID = SETTINGS.embedding_model_id
+MAX_PARALLEL_EMBEDDINGS = SETTINGS.max_parallel_embeddings
+INGEST_WORKERS = SETTINGS.ingest_workers
+FRONTEND_URL = SETTINGS.frontend_url
 
 # AWS Bedrock Model Configuration for GPT-OSS-120B with API Key
-BASE_MODEL = AwsBedrock(
+BASE_MODEL = CachingAwsBedrock(
     id=BEDROCK_MODEL_ID,
     region=AWS_BEDROCK_REGION,  # Oregon for Bedrock
     # Use API key authentication instead of IAM credentials
@@ -67,23 +176,39 @@ BASE_MODEL = AwsBedrock(
         "reasoning_level": "medium",  # low, medium, high
         "enable_chain_of_thought": True,
         "tool_choice": "auto"
-    }
+    },
+    # Forwarded into the Converse request; latency-optimized inference cuts TTFT where offered
+    request_params={"performanceConfig": {"latency": BEDROCK_LATENCY_MODE}} if BEDROCK_LATENCY_MODE != "standard" else None,
+    # Cache the static agent instructions and tool schemas across turns
+    prompt_caching=BEDROCK_PROMPT_CACHING
 )
 
-# Frontend URL for CORS
-FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
-
 # --- Service Connections ---
 
-# AWS Bedrock Embedder for Titan Text Embeddings V2 - Oregon region
+# AWS Bedrock Embedder for Titan Text Embeddings V2 - Singapore region (colocated with OpenSearch)
 # Note: Embeddings still use IAM credentials, not API key
 embedder = BedrockEmbedder(
     model_id="amazon.titan-embed-text-v2:0",
-    region=AWS_BEDROCK_REGION,  # Oregon for Bedrock
+    region=AWS_EMBEDDING_REGION,
+    endpoint_url=BEDROCK_ENDPOINT_URL,
     dimensions=1024,
     normalize=True
 )
 
+# Shared Amazon DocumentDB connection pool - Singapore region
+# minPoolSize keeps warm connections so the first agent turn skips the TLS handshake
+documentdb_client = MongoClient(
+    DOCUMENTDB_URL,
+    tls=True,
+    tlsCAFile="rds-ca-2019-root.pem",
+    retryWrites=False,
+    maxPoolSize=100,
+    minPoolSize=10,
+    # Fail fast instead of queueing indefinitely when the pool is exhausted
+    waitQueueTimeoutMS=5000,
+    socketTimeoutMS=30000
+)
+
 # Amazon OpenSearch Service Vector Database - Singapore region  
 vector_db = OpenSearchVectorDb(
     endpoint=OPENSEARCH_ENDPOINT,
@@ -93,17 +218,25 @@ vector_db = OpenSearchVectorDb(
     embedder=embedder,
     region=AWS_REGION,  
     use_aws_auth=False,  # Using basic auth with username/password
-    dimensions=1024
+    dimensions=1024,
+    data_type=OPENSEARCH_VECTOR_DATA_TYPE,
+    routing_field=OPENSEARCH_ROUTING_FIELD,
+    # Writes only clear this process's result cache, so it is off when several workers serve
+    cache_size=2000 if SETTINGS.web_concurrency == 1 else 0,
+    # Chunks uploaded through the knowledge manager keep their content here
+    content_collection=documentdb_client[DATABASE_NAME]["knowledge_metadata"]
 )
 
 # Storage for agent session history using Amazon DocumentDB - Singapore region
-agent_storage = MongoDbAgentStorage(
+# Sessions are cached in-process for 30s so the next turn skips the cross-region read.
+# Only one process sees its own writes, so the cache is off when several workers serve.
+agent_storage = CachedMongoDbAgentStorage(
     collection_name="agent_data",
     db_url=DOCUMENTDB_URL,
     db_name=DATABASE_NAME,
-    ssl=True,
-    ssl_ca_certs="rds-ca-2019-root.pem",
-    retryWrites=False
+    client=documentdb_client,
+    cache_size=1024 if SETTINGS.web_concurrency == 1 else 0,
+    cache_ttl=30
 )
 
 # Memory V2 with Amazon DocumentDB backend - Singapore region
@@ -111,49 +244,41 @@ memory_db = MongoMemoryDb(
     collection_name="agent_memories",
     db_url=DOCUMENTDB_URL,
     db_name=DATABASE_NAME,
-    ssl=True,
-    ssl_ca_certs="rds-ca-2019-root.pem",
-    retryWrites=False
+    client=documentdb_client
 )
-memory = Memory(db=memory_db)
+memory = RollingSummaryMemory(db=memory_db, summary_interval=SESSION_SUMMARY_INTERVAL)
 
 # --- Knowledge Base Configuration ---
 
 # Legal Knowledge Base with Amazon OpenSearch Service (Singapore)
-legal_knowledge_base = CombinedKnowledgeBase(
-    sources=[
-        PDFKnowledgeBase(
-            path=f"{KNOWLEDGE_BASE_DIR}/pdfs",
-            vector_db=vector_db,
-            reader_config={"chunk_size": 1500, "chunk_overlap": 200, "separator": "\n\n"},
-        ),
-        DocxKnowledgeBase(
-            path=f"{KNOWLEDGE_BASE_DIR}/docx",
-            vector_db=vector_db,
-            reader_config={"chunk_size": 1500, "chunk_overlap": 200},
-        ),
-        TextKnowledgeBase(
-            path=f"{KNOWLEDGE_BASE_DIR}/texts",
-            vector_db=vector_db,
-            reader_config={"chunk_size": 1500, "chunk_overlap": 200},
-        ),
+# One directory walk over all document types, chunked with a single strategy
+legal_knowledge_base = UnifiedKnowledgeBase(
+    paths=[
+        f"{KNOWLEDGE_BASE_DIR}/pdfs",
+        f"{KNOWLEDGE_BASE_DIR}/docx",
+        f"{KNOWLEDGE_BASE_DIR}/texts",
     ],
+    chunk_size=1500,
+    chunk_overlap=200,
     vector_db=vector_db,
 )
 
 # Knowledge search configuration optimized for GPT-OSS-120B
 KNOWLEDGE_SEARCH_CONFIG = {
-    "num_documents": int(os.getenv("MAX_SEARCH_RESULTS", "5")),
-    "similarity_threshold": float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.7"))
+    "num_documents": SETTINGS.max_search_results,
+    "similarity_threshold": SETTINGS.search_similarity_threshold
 }
 
 # Validation and logging
 logger.info(f"Legal AI System Configuration:")
 logger.info(f"  - LLM: GPT-OSS-120B in {AWS_BEDROCK_REGION} (Oregon)")
 logger.info(f"  - Authentication: Bedrock API Key")
+logger.info(f"  - Embeddings: Titan Text Embeddings V2 in {AWS_EMBEDDING_REGION}")
 logger.info(f"  - Vector DB: OpenSearch in {AWS_REGION} (Singapore)")  
 logger.info(f"  - Document DB: DocumentDB in {AWS_DOCUMENTDB_REGION} (Singapore)")
 logger.info(f"  - Model: {BEDROCK_MODEL_ID}")
+logger.info(f"  - Latency mode: {BEDROCK_LATENCY_MODE}")
+logger.info(f"  - Prompt caching: {BASE_MODEL.prompt_caching}")
 
 # Validate critical configurations
 if not AWS_BEARER_TOKEN_BEDROCK:
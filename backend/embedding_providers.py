@@ -0,0 +1,75 @@
+# embedding_providers.py
+"""
+Request/response formats for Bedrock embedding models.
+Titan V2 embeds one text per InvokeModel call; Cohere Embed v3 accepts up to
+96 texts per call, so documents are embedded in far fewer round trips.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+# Compact separators: no whitespace in request bodies
+_SEPARATORS = (',', ':')
+
+
+class EmbeddingProvider(ABC):
+    """Builds InvokeModel bodies and parses embeddings for one Bedrock model family."""
+
+    # Texts per InvokeModel call
+    batch_size: int = 1
+
+    def __init__(self, model_id: str, dimensions: int = 1024):
+        self.model_id = model_id
+        self.dimensions = dimensions
+        self._prepare()
+
+    def _prepare(self) -> None:
+        """Precompute the static parts of the request body."""
+
+    @abstractmethod
+    def build_body(self, texts: List[str], input_type: str) -> str:
+        """Serialize the request body for a batch of at most batch_size texts."""
+
+    @abstractmethod
+    def parse_embeddings(self, response_body: Dict[str, Any]) -> List[List[float]]:
+        """Extract one embedding per input text from the decoded response."""
+
+
+class TitanEmbeddingProvider(EmbeddingProvider):
+    """Amazon Titan Text Embeddings V2: one text per call."""
+
+    batch_size = 1
+
+    def _prepare(self) -> None:
+        # Only the text varies per request; the rest of the body is serialized once
+        self._suffix = f',"dimensions":{int(self.dimensions)},"normalize":true}}'
+
+    def build_body(self, texts: List[str], input_type: str) -> str:
+        return '{"inputText":' + json.dumps(texts[0]) + self._suffix
+
+    def parse_embeddings(self, response_body: Dict[str, Any]) -> List[List[float]]:
+        return [response_body['embedding']]
+
+
+class CohereEmbeddingProvider(EmbeddingProvider):
+    """Cohere Embed v3: up to 96 texts per call, with query/document input types."""
+
+    batch_size = 96
+
+    def build_body(self, texts: List[str], input_type: str) -> str:
+        return json.dumps({
+            "texts": texts,
+            "input_type": input_type,
+            "truncate": "END"
+        }, separators=_SEPARATORS)
+
+    def parse_embeddings(self, response_body: Dict[str, Any]) -> List[List[float]]:
+        return response_body['embeddings']
+
+
+def get_embedding_provider(model_id: str, dimensions: int = 1024) -> EmbeddingProvider:
+    """Return the provider matching a Bedrock embedding model id."""
+    if model_id.startswith("cohere.embed"):
+        return CohereEmbeddingProvider(model_id, dimensions)
+    return TitanEmbeddingProvider(model_id, dimensions)
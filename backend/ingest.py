@@ -0,0 +1,122 @@
+# ingest.py
+"""
+Concurrent ingestion pipeline for the legal knowledge base.
+Sources are parsed and chunked in parallel, chunks are embedded in batches
+and embedded chunks are streamed into parallel _bulk writes to Amazon
+OpenSearch Service.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from agno.document import Document
+from agno.knowledge.agent import AgentKnowledge
+from config import legal_knowledge_base, embedder, vector_db, logger
+
+# Marks the end of a chunk (or embedded batch) stream
+_SOURCE_DONE = object()
+
+
+def _produce_chunks(source: AgentKnowledge, chunks: queue.Queue) -> None:
+    """Parse and chunk one knowledge source, pushing documents onto the queue."""
+    try:
+        for documents in source.document_lists:
+            for doc in documents:
+                chunks.put(doc)
+    except Exception as e:
+        logger.error(f"Error reading {source.__class__.__name__}: {e}")
+    finally:
+        chunks.put(_SOURCE_DONE)
+
+
+def _embed_batch(batch: List[Document]) -> List[Document]:
+    """Embed a batch of chunks concurrently."""
+    embeddings = embedder.get_embedding([doc.content for doc in batch])
+    for doc, embedding in zip(batch, embeddings):
+        doc.embedding = embedding
+    return batch
+
+
+def _write_embedded(embedded: queue.Queue, result: dict) -> None:
+    """Stream embedded batches from the queue into bulk index requests."""
+    actions = (
+        vector_db.document_action(doc)
+        for batch in iter(embedded.get, _SOURCE_DONE)
+        for doc in batch
+    )
+    result["indexed"] = vector_db.bulk_upsert(actions)
+
+
+def ingest_all(
+    knowledge_base: AgentKnowledge = legal_knowledge_base,
+    batch_size: int = 64,
+    max_workers: int = 4
+) -> int:
+    """
+    Load every document of the knowledge base into the vector DB.
+
+    Args:
+        knowledge_base: Knowledge base to ingest (combined sources are each read in their own thread)
+        batch_size: Chunks per embedding batch
+        max_workers: Batches embedded concurrently
+
+    Returns:
+        Number of chunks written
+    """
+    sources = getattr(knowledge_base, "sources", None) or [knowledge_base]
+
+    # Bounded queue so parsing cannot run far ahead of embedding
+    chunks: queue.Queue = queue.Queue(maxsize=4 * batch_size)
+    producers = [
+        threading.Thread(target=_produce_chunks, args=(source, chunks), daemon=True)
+        for source in sources
+    ]
+    for producer in producers:
+        producer.start()
+
+    # Single writer: parallel_bulk fans the action stream out over its own threads
+    embedded: queue.Queue = queue.Queue()
+    result = {"indexed": 0}
+    writer = threading.Thread(target=_write_embedded, args=(embedded, result), daemon=True)
+    writer.start()
+
+    # Limits batches held in memory to those being processed or about to be
+    in_flight = threading.BoundedSemaphore(2 * max_workers)
+
+    def on_embedded(future) -> None:
+        in_flight.release()
+        try:
+            embedded.put(future.result())
+        except Exception as e:
+            logger.error(f"Error embedding batch: {e}")
+
+    def submit(batch: List[Document]) -> None:
+        in_flight.acquire()
+        executor.submit(_embed_batch, batch).add_done_callback(on_embedded)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        remaining = len(producers)
+        batch: List[Document] = []
+        while remaining:
+            item = chunks.get()
+            if item is _SOURCE_DONE:
+                remaining -= 1
+                continue
+            batch.append(item)
+            if len(batch) >= batch_size:
+                submit(batch)
+                batch = []
+        if batch:
+            submit(batch)
+
+    embedded.put(_SOURCE_DONE)
+    writer.join()
+    total_chunks = result["indexed"]
+
+    logger.info(f"Ingested {total_chunks} chunks from {len(sources)} knowledge sources")
+    return total_chunks
+
+
+if __name__ == "__main__":
+    ingest_all()
@@ -1,40 +1,121 @@
 # knowledge_manager.py
+import io
 import os
 import uuid
 import asyncio
+import hashlib
+from functools import lru_cache
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import UploadFile
 import boto3
 import json
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
+from contextlib import closing
+from botocore.exceptions import ClientError
+from opensearchpy import OpenSearch, RequestsHttpConnection, helpers
 import pymongo
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
 from agno.knowledge.pdf import PDFReader
 from agno.knowledge.docx import DocxReader
 from agno.knowledge.text import TextReader
+from ttl_cache import TTLCache
+from aws_embedder import get_bedrock_client, trim_embedding
+from opensearch_vectordb import build_index_body, get_aws4auth
+from embedding_providers import get_embedding_provider
+from opensearch_serializer import CompactJSONSerializer
 
 # Import configuration
 from config import (
-    vector_db, embedder, DOCUMENTDB_URL, DATABASE_NAME,
+    vector_db, embedder, documentdb_client, DATABASE_NAME,
     KNOWLEDGE_BASE_DIR, OPENSEARCH_ENDPOINT, OPENSEARCH_INDEX,
-    AWS_REGION, AWS_BEDROCK_REGION, AWS_DOCUMENTDB_REGION, logger
+    AWS_REGION, AWS_BEDROCK_REGION, AWS_DOCUMENTDB_REGION, AWS_EMBEDDING_REGION,
+    BEDROCK_ENDPOINT_URL, BEDROCK_LATENCY_MODE, EMBEDDING_MODEL_ID, MAX_PARALLEL_EMBEDDINGS,
+    KNOWLEDGE_ROUTING_BY_CATEGORY, logger
 )
 
+# Upload bytes read and written per step
+UPLOAD_CHUNK_SIZE = 1 << 20
+# Uploads up to this size are parsed from the bytes already in memory instead of re-read from disk
+IN_MEMORY_PARSE_LIMIT = 16 << 20
+
+# Stands in for the query vector in cached search templates
+_VECTOR_PLACEHOLDER = "__query_vector__"
+
+
+def _similarity_to_score(space_type: str, similarity: float) -> float:
+    """k-NN score OpenSearch reports for a given cosine similarity in this space."""
+    if space_type == "cosinesimil":
+        return (1.0 + similarity) / 2.0
+    # innerproduct (unit-length vectors, so inner product is cosine)
+    return 1.0 + similarity if similarity >= 0 else 1.0 / (1.0 - similarity)
+
+def _score_to_similarity(space_type: str, score: float) -> float:
+    """Cosine similarity of a k-NN hit, inverting _similarity_to_score."""
+    if space_type == "cosinesimil":
+        return 2.0 * score - 1.0
+    return score - 1.0 if score >= 1.0 else 1.0 - 1.0 / score
+
+@lru_cache(maxsize=64)
+def _search_template(
+    knn_engine: str,
+    space_type: str,
+    limit: int,
+    similarity_threshold: float,
+    document_type: Optional[str],
+    category: Optional[str]
+) -> Tuple[str, str]:
+    """Serialized k-NN search body split around the query vector, as (prefix, suffix)."""
+    must_clauses = []
+    if document_type:
+        must_clauses.append({"term": {"document_type": document_type}})
+    if category:
+        must_clauses.append({"term": {"category": category}})
+    
+    search_body = {
+        "size": limit,
+        # Hits are hydrated from DocumentDB; never ship the vectors back
+        "_source": {"excludes": ["vector"]},
+        "min_score": _similarity_to_score(space_type, similarity_threshold)
+    }
+    
+    # Approximate k-NN over the HNSW graph
+    if knn_engine == "faiss":
+        # Faiss filters during graph traversal, so exactly `limit` results survive
+        knn_params = {"vector": _VECTOR_PLACEHOLDER, "k": limit}
+        if must_clauses:
+            knn_params["filter"] = {"bool": {"must": must_clauses}}
+        search_body["query"] = {"knn": {"vector": knn_params}}
+    else:
+        # nmslib has no efficient filtering, so filters are applied to an oversampled candidate set
+        knn_query = {
+            "knn": {
+                "vector": {
+                    "vector": _VECTOR_PLACEHOLDER,
+                    "k": limit * 10 if must_clauses else limit
+                }
+            }
+        }
+        search_body["query"] = {
+            "bool": {
+                "must": [knn_query],
+                "filter": must_clauses
+            }
+        } if must_clauses else knn_query
+    
+    prefix, suffix = json.dumps(search_body, separators=(",", ":")).split(
+        json.dumps(_VECTOR_PLACEHOLDER)
+    )
+    return prefix, suffix
+
 class KnowledgeManager:
     """Manages knowledge base operations using Amazon OpenSearch Service and DocumentDB."""
 
     def __init__(self):
-        # Initialize AWS credentials for OpenSearch
-        credentials = boto3.Session().get_credentials()
-        awsauth = AWS4Auth(
-            credentials.access_key,
-            credentials.secret_key,
-            AWS_REGION,
-            'es',
-            session_token=credentials.token
-        )
+        # Shared SigV4 signer for OpenSearch (refreshes rotated credentials)
+        awsauth = get_aws4auth(AWS_REGION)
         
         # Amazon OpenSearch Service client
         self.opensearch_client = OpenSearch(
@@ -42,24 +123,52 @@ class KnowledgeManager:
             http_auth=awsauth,
             use_ssl=True,
             verify_certs=True,
-            connection_class=RequestsHttpConnection
+            connection_class=RequestsHttpConnection,
+            # Enough pooled keep-alive connections for concurrent searches and bulk writes
+            pool_maxsize=64,
+            timeout=30,
+            max_retries=3,
+            retry_on_timeout=True,
+            serializer=CompactJSONSerializer()
         )
         
-        # Amazon DocumentDB client (MongoDB-compatible)
-        self.documentdb_client = pymongo.MongoClient(
-            DOCUMENTDB_URL,
-            ssl=True,
-            ssl_ca_certs='rds-ca-2019-root.pem',
-            retryWrites=False
-        )
+        # Amazon DocumentDB client (MongoDB-compatible), sharing the application's connection pool
+        self.documentdb_client = documentdb_client
         self.db = self.documentdb_client[DATABASE_NAME]
         self.metadata_collection = self.db["knowledge_metadata"]
+        # Search hits are joined back to their chunks by OpenSearch id
+        self.metadata_collection.create_index("opensearch_doc_id")
+        self.metadata_collection.create_index("document_id")
+        # One row per uploaded document, so listing is O(documents) rather than O(chunks)
+        self.summary_collection = self.db["documents_summary"]
+        self.summary_collection.create_index([("created_at", pymongo.DESCENDING)])
+        self._backfill_documents_summary()
+        # Chunk embeddings keyed by file content hash, reused on re-upload and reindex
+        self.chunk_embedding_collection = self.db["chunk_embedding_cache"]
+        # Query embeddings persisted across processes and restarts
+        self.query_embedding_collection = self.db["query_embedding_cache"]
+        # In-process LRU of query embeddings in front of the DocumentDB cache
+        self._query_embed_cache = TTLCache(maxsize=10000, ttl=None)
         
-        # AWS Bedrock client for embeddings
-        self.bedrock_client = boto3.client(
-            'bedrock-runtime',
-            region_name=AWS_REGION
+        # AWS Bedrock client for embeddings, in the same region as OpenSearch. Shared with the
+        # embedder: boto3 clients are thread-safe and its connection pool covers every worker.
+        self.bedrock_client = get_bedrock_client(AWS_EMBEDDING_REGION, BEDROCK_ENDPOINT_URL)
+        # Request format for the configured model (Titan: 1 text per call, Cohere: 96)
+        self.embedding_provider = get_embedding_provider(EMBEDDING_MODEL_ID, dimensions=1024)
+        # Dedicated threads so the default executor size (cpu + 4) does not cap embedding concurrency
+        self._embedding_executor = ThreadPoolExecutor(
+            max_workers=MAX_PARALLEL_EMBEDDINGS,
+            thread_name_prefix="km-embed"
         )
+        # Latency-optimized inference, dropped after the first ValidationException
+        # for model/region combinations that do not support it
+        self._latency_mode = BEDROCK_LATENCY_MODE if BEDROCK_LATENCY_MODE != "standard" else None
+        # Bounds in-flight InvokeModel calls across all requests
+        self._embedding_semaphore = asyncio.Semaphore(MAX_PARALLEL_EMBEDDINGS)
+        
+        # Background ingestion (started from the app lifespan via start_ingest_workers)
+        self._ingest_queue: Optional[asyncio.Queue] = None
+        self._ingest_workers: List[asyncio.Task] = []
         
         # Document readers
         self.readers = {
@@ -71,40 +180,79 @@ class KnowledgeManager:
         # Ensure knowledge base directory exists
         Path(KNOWLEDGE_BASE_DIR).mkdir(parents=True, exist_ok=True)
         
+        # Open the connections now so the first request skips the TLS handshakes
+        self._warm_connections()
+        
         # Ensure OpenSearch index exists
         self._ensure_opensearch_index()
+        # Engine of the live mapping decides how filtered searches are built,
+        # its space type how similarities map to k-NN scores
+        self._knn_engine, self._knn_space_type = self._get_knn_method()
+
+    def _backfill_documents_summary(self):
+        """Build documents_summary from existing chunks the first time it is used."""
+        try:
+            if self.summary_collection.estimated_document_count() or \
+                    not self.metadata_collection.estimated_document_count():
+                return
+            
+            pipeline = [
+                {
+                    "$group": {
+                        "_id": "$document_id",
+                        "file_name": {"$first": "$file_name"},
+                        "file_path": {"$first": "$file_path"},
+                        "document_type": {"$first": "$document_type"},
+                        "category": {"$first": "$category"},
+                        "chunk_count": {"$sum": 1},
+                        "created_at": {"$first": "$created_at"},
+                        "updated_at": {"$max": "$updated_at"},
+                        "total_content_length": {"$sum": "$content_length"}
+                    }
+                }
+            ]
+            summaries = list(self.metadata_collection.aggregate(pipeline))
+            if summaries:
+                self.summary_collection.insert_many(summaries, ordered=False)
+            logger.info(f"Backfilled documents_summary with {len(summaries)} documents")
+        except Exception as e:
+            logger.warning(f"Could not backfill documents_summary: {e}")
+
+    def _warm_connections(self):
+        """Ping OpenSearch and DocumentDB to establish pooled connections up front."""
+        try:
+            self.opensearch_client.ping()
+            self.db.command("ping")
+        except Exception as e:
+            logger.warning(f"Connection warm-up failed: {e}")
+
+    def warmup(self) -> None:
+        """
+        Load the index's k-NN graphs into native memory and run one search through
+        the knowledge search path, so the first user query does not hit a cold index.
+        """
+        try:
+            self.opensearch_client.transport.perform_request(
+                "GET",
+                f"/_plugins/_knn/warmup/{OPENSEARCH_INDEX}"
+            )
+            # Fixed unit vector: opens segments and exercises the search path without a Bedrock call
+            warmup_vector = [1.0] + [0.0] * 1023
+            response = self.opensearch_client.search(
+                index=OPENSEARCH_INDEX,
+                body=self._build_search_body(warmup_vector, 1, -1.0)
+            )
+            # Pull the DocumentDB join index into cache along with the first hit
+            self._format_hits([response['hits']['hits']])
+            logger.info(f"Warmed up OpenSearch index {OPENSEARCH_INDEX}")
+        except Exception as e:
+            logger.warning(f"Knowledge index warm-up failed: {e}")
 
     def _ensure_opensearch_index(self):
         """Create OpenSearch index if it doesn't exist."""
         if not self.opensearch_client.indices.exists(index=OPENSEARCH_INDEX):
-            index_mapping = {
-                "mappings": {
-                    "properties": {
-                        "vector": {
-                            "type": "knn_vector",
-                            "dimension": 1024,
-                            "method": {
-                                "name": "hnsw",
-                                "space_type": "cosinesimil",
-                                "engine": "nmslib"
-                            }
-                        },
-                        "content": {"type": "text"},
-                        "file_name": {"type": "keyword"},
-                        "document_type": {"type": "keyword"},
-                        "category": {"type": "keyword"},
-                        "chunk_index": {"type": "integer"},
-                        "mongo_doc_id": {"type": "keyword"},
-                        "created_at": {"type": "date"}
-                    }
-                },
-                "settings": {
-                    "index": {
-                        "knn": True,
-                        "knn.algo_param.ef_search": 512
-                    }
-                }
-            }
+            # Same mapping as the agents' vector DB, which shares this index
+            index_mapping = build_index_body()
             
             self.opensearch_client.indices.create(
                 index=OPENSEARCH_INDEX,
@@ -112,91 +260,192 @@ class KnowledgeManager:
             )
             logger.info(f"Created OpenSearch index: {OPENSEARCH_INDEX}")
 
-    def _generate_embeddings_bedrock(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings using AWS Bedrock Titan Text Embeddings V2."""
-        embeddings = []
+    def _get_knn_method(self) -> Tuple[str, str]:
+        """Return the k-NN engine and space type of the index's vector field (indexes may predate faiss)."""
+        try:
+            mapping = self.opensearch_client.indices.get_mapping(index=OPENSEARCH_INDEX)
+            properties = next(iter(mapping.values()))["mappings"]["properties"]
+            method = properties["vector"].get("method", {})
+            return method.get("engine", "nmslib"), method.get("space_type", "cosinesimil")
+        except Exception as e:
+            logger.warning(
+                f"Could not read k-NN method for {OPENSEARCH_INDEX}, assuming nmslib cosinesimil: {e}"
+            )
+            return "nmslib", "cosinesimil"
+
+    def _generate_embeddings_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        """Generate embeddings for one provider-sized batch with a single InvokeModel call."""
+        body = self.embedding_provider.build_body(texts, input_type)
         
-        for text in texts:
-            body = json.dumps({
-                "inputText": text,
-                "dimensions": 1024,
-                "normalize": True
-            })
-            
-            response = self.bedrock_client.invoke_model(
-                body=body,
-                modelId="amazon.titan-embed-text-v2:0",
-                accept="application/json",
-                contentType="application/json"
+        request = {
+            "body": body,
+            "modelId": EMBEDDING_MODEL_ID,
+            "accept": "application/json",
+            "contentType": "application/json"
+        }
+        
+        latency_mode = self._latency_mode
+        if latency_mode:
+            try:
+                response = self.bedrock_client.invoke_model(performanceConfigLatency=latency_mode, **request)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "ValidationException":
+                    raise
+                logger.warning(f"Latency-optimized inference unavailable for {EMBEDDING_MODEL_ID}, using standard: {e}")
+                self._latency_mode = None
+                response = self.bedrock_client.invoke_model(**request)
+        else:
+            response = self.bedrock_client.invoke_model(**request)
+        
+        # Decode the raw bytes directly and release the connection back to the pool
+        with closing(response['body']) as response_stream:
+            response_body = json.loads(response_stream.read())
+        return self.embedding_provider.parse_embeddings(response_body)
+
+    async def _agenerate_embeddings_bedrock(
+        self,
+        texts: List[str],
+        input_type: str = "search_document"
+    ) -> List[List[float]]:
+        """
+        Generate embeddings concurrently, one InvokeModel call per provider batch, in input order.
+        
+        Args:
+            texts: Texts to embed
+            input_type: "search_document" for indexed chunks, "search_query" for queries
+                (used by models that embed the two differently)
+        """
+        batch_size = self.embedding_provider.batch_size
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        
+        async def embed(batch: List[str]) -> List[List[float]]:
+            async with self._embedding_semaphore:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._embedding_executor, self._generate_embeddings_batch, batch, input_type
+                )
+        
+        results = await asyncio.gather(*(embed(batch) for batch in batches))
+        return [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+    async def _aget_chunk_embeddings(self, file_hash: str, contents: List[str]) -> List[List[float]]:
+        """Embed a file's chunks, reusing cached embeddings for an identical file."""
+        keys = [f"{file_hash}:{EMBEDDING_MODEL_ID}:{i}" for i in range(len(contents))]
+        content_hashes = [hashlib.sha256(content.encode('utf-8')).hexdigest() for content in contents]
+        
+        # A hit only counts if the chunk text still matches (e.g. chunking settings changed)
+        cached = {
+            doc["_id"]: doc
+            for doc in await asyncio.to_thread(
+                lambda: list(self.chunk_embedding_collection.find({"_id": {"$in": keys}}))
             )
-            
-            response_body = json.loads(response.get('body').read())
-            embeddings.append(response_body['embedding'])
+        }
+        embeddings = {
+            key: cached[key]["embedding"]
+            for key, content_hash in zip(keys, content_hashes)
+            if key in cached and cached[key].get("content_sha256") == content_hash
+        }
         
-        return embeddings
+        missing = [i for i, key in enumerate(keys) if key not in embeddings]
+        if missing:
+            new_embeddings = await self._agenerate_embeddings_bedrock([contents[i] for i in missing])
+            operations = []
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[keys[i]] = embedding
+                operations.append(ReplaceOne(
+                    {"_id": keys[i]},
+                    {
+                        "embedding": embedding,
+                        "content_sha256": content_hashes[i],
+                        "created_at": datetime.now(timezone.utc)
+                    },
+                    upsert=True
+                ))
+            try:
+                await asyncio.to_thread(
+                    self.chunk_embedding_collection.bulk_write, operations, ordered=False
+                )
+            except BulkWriteError as e:
+                # The embeddings are already computed; a failed cache write only costs a future re-embed
+                logger.warning(f"Could not cache {len(e.details.get('writeErrors', []))} chunk embeddings")
+        
+        logger.info(f"Chunk embeddings: {len(keys) - len(missing)} cached, {len(missing)} generated")
+        return [embeddings[key] for key in keys]
 
-    async def search_knowledge(
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        """Embed a search query, serving repeats from memory or DocumentDB instead of Bedrock."""
+        query = query.strip()
+        # Whitespace-insensitive cache key; case is kept since it can change the embedding ("US" vs "us")
+        normalized = " ".join(query.split())
+        key = hashlib.sha256(f"{EMBEDDING_MODEL_ID}:{normalized}".encode('utf-8')).hexdigest()
+        
+        embedding = self._query_embed_cache.get(key)
+        if embedding is not None:
+            return embedding
+        
+        cached = await asyncio.to_thread(
+            self.query_embedding_collection.find_one, {"_id": key}, {"embedding": 1}
+        )
+        if cached:
+            embedding = cached["embedding"]
+        else:
+            embedding = (await self._agenerate_embeddings_bedrock([query], input_type="search_query"))[0]
+            try:
+                await asyncio.to_thread(self.query_embedding_collection.insert_one, {
+                    "_id": key,
+                    "embedding": embedding,
+                    "created_at": datetime.now(timezone.utc)
+                })
+            except pymongo.errors.DuplicateKeyError:
+                pass  # Another worker cached the same query first
+        
+        self._query_embed_cache.set(key, embedding)
+        return embedding
+
+    def _build_search_body(
         self,
-        query: str,
-        limit: int = 5,
-        similarity_threshold: float = 0.7,
+        query_embedding: List[float],
+        limit: int,
+        similarity_threshold: float,
         document_type: Optional[str] = None,
         category: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
-        """Search the knowledge base using OpenSearch vector similarity."""
-        try:
-            # Generate embedding for the query using Bedrock
-            query_embedding = self._generate_embeddings_bedrock([query])[0]
-            
-            # Build OpenSearch query
-            must_clauses = []
-            if document_type:
-                must_clauses.append({"term": {"document_type": document_type}})
-            if category:
-                must_clauses.append({"term": {"category": category}})
-            
-            search_body = {
-                "size": limit,
-                "min_score": similarity_threshold,
-                "query": {
-                    "script_score": {
-                        "query": {
-                            "bool": {
-                                "must": must_clauses
-                            }
-                        } if must_clauses else {"match_all": {}},
-                        "script": {
-                            "source": "cosineSimilarity(params.query_vector, 'vector') + 1.0",
-                            "params": {"query_vector": query_embedding}
-                        }
-                    }
-                }
-            }
-            
-            # Perform search
-            response = self.opensearch_client.search(
-                index=OPENSEARCH_INDEX,
-                body=search_body
+    ) -> str:
+        """Build the serialized OpenSearch k-NN search body for an embedded query."""
+        prefix, suffix = _search_template(
+            self._knn_engine, self._knn_space_type, limit, similarity_threshold, document_type, category
+        )
+        # Only the query vector is serialized per request
+        return prefix + json.dumps(trim_embedding(query_embedding), separators=(",", ":")) + suffix
+
+    def _format_hits(self, hit_lists: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """Format OpenSearch hits per query, joined with their DocumentDB chunks."""
+        hit_ids = [hit['_id'] for hits in hit_lists for hit in hits]
+        
+        # Get additional metadata from DocumentDB for all hits in one query
+        mongo_docs = {
+            doc["opensearch_doc_id"]: doc
+            for doc in self.metadata_collection.find(
+                {"opensearch_doc_id": {"$in": hit_ids}}
             )
-            
-            # Format results
+        } if hit_ids else {}
+        
+        formatted = []
+        for hits in hit_lists:
             results = []
-            for hit in response['hits']['hits']:
+            for hit in hits:
                 source = hit['_source']
-                
-                # Get additional metadata from DocumentDB
-                mongo_doc = self.metadata_collection.find_one(
-                    {"opensearch_doc_id": hit['_id']}
-                )
+                # Chunk content and descriptive fields come from DocumentDB; fall back to
+                # the OpenSearch source for entries indexed before the compact schema
+                mongo_doc = mongo_docs.get(hit['_id'])
+                details = mongo_doc or source
                 
                 result = {
                     "opensearch_doc_id": hit['_id'],
-                    "similarity_score": hit['_score'] - 1.0,  # Adjust for cosine similarity
-                    "content": source.get("content", ""),
-                    "file_name": source.get("file_name", ""),
+                    "similarity_score": _score_to_similarity(self._knn_space_type, hit['_score']),
+                    "content": details.get("content", "")[:1000],
+                    "file_name": details.get("file_name", ""),
                     "document_type": source.get("document_type", ""),
                     "category": source.get("category", "general"),
-                    "chunk_index": source.get("chunk_index", 0),
+                    "chunk_index": details.get("chunk_index", 0),
                     "mongo_doc_id": source.get("mongo_doc_id", ""),
                     "metadata": source
                 }
@@ -207,6 +456,34 @@ class KnowledgeManager:
                     result["mongo_metadata"] = mongo_doc.get("metadata", {})
                 
                 results.append(result)
+            formatted.append(results)
+        
+        return formatted
+
+    async def search_knowledge(
+        self,
+        query: str,
+        limit: int = 5,
+        similarity_threshold: float = 0.7,
+        document_type: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Search the knowledge base using OpenSearch vector similarity."""
+        try:
+            # Generate (or reuse a cached) embedding for the query using Bedrock
+            query_embedding = await self._aget_query_embedding(query)
+            
+            # Perform search (blocking client calls run off the event loop)
+            response = await asyncio.to_thread(
+                self.opensearch_client.search,
+                index=OPENSEARCH_INDEX,
+                body=self._build_search_body(
+                    query_embedding, limit, similarity_threshold, document_type, category
+                ),
+                routing=self._routing(category)
+            )
+            
+            results = (await asyncio.to_thread(self._format_hits, [response['hits']['hits']]))[0]
             
             logger.info(f"Knowledge search for '{query}' returned {len(results)} results")
             return results
@@ -215,15 +492,77 @@ class KnowledgeManager:
             logger.error(f"Error in knowledge search: {e}")
             raise
 
+    async def search_knowledge_batch(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        similarity_threshold: float = 0.7,
+        document_type: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search several queries with one msearch request; results are returned per query."""
+        try:
+            if not queries:
+                return []
+            
+            # Embed all queries concurrently
+            query_embeddings = await asyncio.gather(
+                *(self._aget_query_embedding(query) for query in queries)
+            )
+            
+            # One header/body pair per query
+            header = {"index": OPENSEARCH_INDEX}
+            routing = self._routing(category)
+            if routing is not None:
+                header["routing"] = routing
+            
+            body = []
+            for query_embedding in query_embeddings:
+                body.append(header)
+                body.append(self._build_search_body(
+                    query_embedding, limit, similarity_threshold, document_type, category
+                ))
+            
+            response = await asyncio.to_thread(self.opensearch_client.msearch, body=body)
+            
+            hit_lists = []
+            for query, item in zip(queries, response['responses']):
+                if 'error' in item:
+                    logger.error(f"Knowledge search for '{query}' failed: {item['error']}")
+                    hit_lists.append([])
+                else:
+                    hit_lists.append(item['hits']['hits'])
+            
+            results = await asyncio.to_thread(self._format_hits, hit_lists)
+            
+            logger.info(f"Batch knowledge search for {len(queries)} queries returned {sum(map(len, results))} results")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error in batch knowledge search: {e}")
+            raise
+
     async def add_document(
         self,
         file: UploadFile,
         document_type: str,
         category: str = "general",
-        metadata: Dict[str, Any] = None
+        metadata: Dict[str, Any] = None,
+        background: bool = True
     ) -> Dict[str, Any]:
-        """Add a new document to the knowledge base."""
+        """
+        Add a new document to the knowledge base.
+        
+        The file is saved immediately. With background=True (and ingest workers running),
+        parsing, embedding and indexing happen on the ingest queue and the document is
+        returned with status "pending"; otherwise it is indexed before returning.
+        """
         try:
+            # Process document
+            reader = self.readers.get(document_type)
+            if not reader:
+                raise ValueError(f"Unsupported document type: {document_type}")
+            
             # Generate unique document ID
             document_id = str(uuid.uuid4())
             
@@ -231,136 +570,367 @@ class KnowledgeManager:
             category_dir = Path(KNOWLEDGE_BASE_DIR) / category
             category_dir.mkdir(parents=True, exist_ok=True)
             
-            # Save file
+            # Save file, streaming it in 1 MiB chunks with writes off the event loop
             file_path = category_dir / f"{document_id}_{file.filename}"
-            content = await file.read()
+            file_hash = hashlib.sha256()
+            # Small uploads are also kept in memory for parsing; large ones are only streamed
+            buffered: Optional[List[bytes]] = []
+            buffered_size = 0
             with open(file_path, "wb") as f:
-                f.write(content)
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    file_hash.update(chunk)
+                    if buffered is not None:
+                        buffered_size += len(chunk)
+                        if buffered_size <= IN_MEMORY_PARSE_LIMIT:
+                            buffered.append(chunk)
+                        else:
+                            buffered = None
+                    await asyncio.to_thread(f.write, chunk)
             
-            # Process document
-            reader = self.readers.get(document_type)
-            if not reader:
-                raise ValueError(f"Unsupported document type: {document_type}")
+            # Readers take a file-like object (named for the document name) or a Path
+            if buffered is not None:
+                source = io.BytesIO(b"".join(buffered))
+                source.name = file.filename
+            else:
+                source = file_path
             
-            documents = reader.read(str(file_path))
+            now = datetime.now(timezone.utc)
+            await asyncio.to_thread(
+                self.summary_collection.update_one,
+                {"_id": document_id},
+                {
+                    "$set": {
+                        "file_name": file.filename,
+                        "file_path": str(file_path),
+                        "document_type": document_type,
+                        "category": category,
+                        # Kept so a job re-queued after a restart indexes with the same metadata
+                        "metadata": metadata,
+                        "status": "pending",
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {
+                        "created_at": now,
+                        "chunk_count": 0,
+                        "total_content_length": 0
+                    }
+                },
+                upsert=True
+            )
             
-            # Generate embeddings using Bedrock
-            contents = [doc.content for doc in documents]
-            if contents:
-                embeddings = self._generate_embeddings_bedrock(contents)
-            else:
-                embeddings = []
-
-            opensearch_docs = []
-            metadata_docs = []
+            job = {
+                "document_id": document_id,
+                "file_path": file_path,
+                "file_name": file.filename,
+                "document_type": document_type,
+                "category": category,
+                "metadata": metadata,
+                "file_hash": file_hash.hexdigest(),
+                "source": source
+            }
             
-            # Process documents and embeddings
-            for i, doc in enumerate(documents):
-                embedding = embeddings[i]
-                
-                # Create unique IDs
-                opensearch_id = str(uuid.uuid4())
-                mongo_id = f"{document_id}_chunk_{i}"
-                
-                # Prepare metadata
-                doc_metadata = {
+            if background and self._ingest_workers:
+                await self._ingest_queue.put(job)
+                logger.info(f"Queued document {file.filename} for indexing")
+                return {
                     "document_id": document_id,
+                    "chunks_created": 0,
                     "file_path": str(file_path),
-                    "file_name": file.filename,
-                    "document_type": document_type,
-                    "category": category,
-                    "chunk_index": i,
-                    "total_chunks": len(documents),
-                    "mongo_doc_id": mongo_id,
-                    "opensearch_doc_id": opensearch_id,
-                    "created_at": datetime.now(timezone.utc).isoformat()
-                }
-                
-                # Add custom metadata
-                if metadata:
-                    doc_metadata.update(metadata)
-                
-                # Add document-specific metadata
-                if hasattr(doc, 'meta') and doc.meta:
-                    doc_metadata.update(doc.meta)
-                
-                # Create OpenSearch document
-                opensearch_doc = {
-                    "vector": embedding,
-                    "content": doc.content[:1000],  # Truncate for OpenSearch storage
-                    "file_name": file.filename,
-                    "document_type": document_type,
-                    "category": category,
-                    "chunk_index": i,
-                    "mongo_doc_id": mongo_id,
-                    "created_at": doc_metadata["created_at"]
+                    "status": "pending"
                 }
-                opensearch_docs.append((opensearch_id, opensearch_doc))
-                
-                # Prepare DocumentDB document
-                mongo_doc = {
-                    "_id": mongo_id,
-                    "document_id": document_id,
-                    "opensearch_doc_id": opensearch_id,
-                    "file_path": str(file_path),
-                    "file_name": file.filename,
-                    "document_type": document_type,
-                    "category": category,
-                    "chunk_index": i,
-                    "total_chunks": len(documents),
-                    "content": doc.content,
-                    "content_length": len(doc.content),
-                    "metadata": doc_metadata,
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                }
-                metadata_docs.append(mongo_doc)
-            
-            # Insert into OpenSearch
-            for doc_id, doc_body in opensearch_docs:
-                self.opensearch_client.index(
-                    index=OPENSEARCH_INDEX,
-                    id=doc_id,
-                    body=doc_body
-                )
-            
-            # Insert into DocumentDB
-            if metadata_docs:
-                self.metadata_collection.insert_many(metadata_docs)
-            
-            logger.info(f"Added document {file.filename} with {len(documents)} chunks")
             
+            chunks_created = await self._index_document(job)
             return {
                 "document_id": document_id,
-                "chunks_created": len(documents),
-                "file_path": str(file_path)
+                "chunks_created": chunks_created,
+                "file_path": str(file_path),
+                "status": "indexed"
             }
             
         except Exception as e:
             logger.error(f"Error adding document: {e}")
             raise
 
+    async def _index_document(self, job: Dict[str, Any]) -> int:
+        """Parse, embed and index a saved document; returns the number of chunks created."""
+        document_id = job["document_id"]
+        file_path = job["file_path"]
+        file_name = job["file_name"]
+        document_type = job["document_type"]
+        category = job["category"]
+        metadata = job["metadata"]
+        
+        # Parsing (e.g. PDF text extraction) is CPU-bound; keep it off the event loop
+        reader = self.readers[document_type]
+        documents = await asyncio.to_thread(reader.read, job["source"])
+        
+        # Generate embeddings using Bedrock (only for chunks not seen in this exact file before)
+        contents = [doc.content for doc in documents]
+        if contents:
+            embeddings = await self._aget_chunk_embeddings(job["file_hash"], contents)
+        else:
+            embeddings = []
+
+        opensearch_docs = []
+        metadata_docs = []
+        
+        # Process documents and embeddings
+        for i, doc in enumerate(documents):
+            embedding = embeddings[i]
+            
+            # IDs derive from the document and chunk, so re-indexing a document overwrites its chunks
+            opensearch_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{document_id}/{i}"))
+            mongo_id = f"{document_id}_chunk_{i}"
+            
+            # Prepare metadata
+            doc_metadata = {
+                "document_id": document_id,
+                "file_path": str(file_path),
+                "file_name": file_name,
+                "document_type": document_type,
+                "category": category,
+                "chunk_index": i,
+                "total_chunks": len(documents),
+                "mongo_doc_id": mongo_id,
+                "opensearch_doc_id": opensearch_id,
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }
+            
+            # Add custom metadata
+            if metadata:
+                doc_metadata.update(metadata)
+            
+            # Add document-specific metadata
+            if hasattr(doc, 'meta') and doc.meta:
+                doc_metadata.update(doc.meta)
+            
+            # Create OpenSearch document (vector, filter fields and join key only)
+            opensearch_doc = {
+                "vector": trim_embedding(embedding),
+                "document_type": document_type,
+                "category": category,
+                "mongo_doc_id": mongo_id
+            }
+            opensearch_docs.append((opensearch_id, opensearch_doc))
+            
+            # Prepare DocumentDB document
+            mongo_doc = {
+                "_id": mongo_id,
+                "document_id": document_id,
+                "opensearch_doc_id": opensearch_id,
+                "file_path": str(file_path),
+                "file_name": file_name,
+                "document_type": document_type,
+                "category": category,
+                "chunk_index": i,
+                "total_chunks": len(documents),
+                "content": doc.content,
+                "content_length": len(doc.content),
+                "metadata": doc_metadata,
+                "created_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
+            }
+            metadata_docs.append(mongo_doc)
+        
+        # Insert into OpenSearch and DocumentDB concurrently
+        if metadata_docs:
+            await asyncio.gather(
+                asyncio.to_thread(self._bulk_index_opensearch, opensearch_docs),
+                asyncio.to_thread(self._bulk_upsert_metadata, metadata_docs)
+            )
+        
+        # Agent knowledge searches share this index
+        vector_db.query_cache.clear()
+        
+        await asyncio.to_thread(
+            self.summary_collection.update_one,
+            {"_id": document_id},
+            {
+                "$set": {
+                    "status": "indexed",
+                    "chunk_count": len(metadata_docs),
+                    "total_content_length": sum(doc["content_length"] for doc in metadata_docs),
+                    "updated_at": datetime.now(timezone.utc)
+                }
+            }
+        )
+        
+        logger.info(f"Added document {file_name} with {len(documents)} chunks")
+        return len(documents)
+
+    async def start_ingest_workers(self, num_workers: int = 2) -> None:
+        """Start the background workers that index queued uploads (call from the running loop)."""
+        if self._ingest_workers:
+            return
+        self._ingest_queue = asyncio.Queue(maxsize=64)
+        self._ingest_workers = [
+            asyncio.create_task(self._ingest_worker()) for _ in range(num_workers)
+        ]
+        # Jobs queued before a restart only survive as "pending" summary rows
+        self._ingest_workers.append(asyncio.create_task(self._requeue_pending_documents()))
+        logger.info(f"Started {num_workers} knowledge ingest workers")
+
+    async def _requeue_pending_documents(self) -> None:
+        """Queue pending uploads left by a previous process again, or mark them failed if their file is gone."""
+        try:
+            pending = await asyncio.to_thread(
+                lambda: list(self.summary_collection.find({"status": "pending"}))
+            )
+        except Exception as e:
+            logger.warning(f"Could not read pending documents: {e}")
+            return
+        
+        requeued = 0
+        for summary in pending:
+            document_id = summary["_id"]
+            file_path = Path(summary.get("file_path", ""))
+            if summary.get("document_type") not in self.readers or not file_path.is_file():
+                await asyncio.to_thread(
+                    self.summary_collection.update_one,
+                    {"_id": document_id, "status": "pending"},
+                    {"$set": {"status": "failed", "error": "Upload was not indexed before a restart"}}
+                )
+                continue
+            
+            # Claim the row so another worker process does not queue it as well
+            claimed = await asyncio.to_thread(
+                self.summary_collection.update_one,
+                {"_id": document_id, "status": "pending", "updated_at": summary.get("updated_at")},
+                {"$set": {"updated_at": datetime.now(timezone.utc)}}
+            )
+            if not claimed.modified_count:
+                continue
+            
+            await self._ingest_queue.put({
+                "document_id": document_id,
+                "file_path": file_path,
+                "file_name": summary.get("file_name", file_path.name),
+                "document_type": summary["document_type"],
+                "category": summary.get("category", "general"),
+                "metadata": summary.get("metadata"),
+                "file_hash": await asyncio.to_thread(self._hash_file, file_path),
+                "source": file_path
+            })
+            requeued += 1
+        
+        if requeued:
+            logger.info(f"Re-queued {requeued} pending documents for indexing")
+
+    @staticmethod
+    def _hash_file(file_path: Path) -> str:
+        """SHA-256 of a saved upload, read in UPLOAD_CHUNK_SIZE pieces."""
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            while chunk := f.read(UPLOAD_CHUNK_SIZE):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    async def stop_ingest_workers(self) -> None:
+        """Cancel the ingest workers; queued documents stay "pending" and are re-queued on the next start."""
+        for worker in self._ingest_workers:
+            worker.cancel()
+        await asyncio.gather(*self._ingest_workers, return_exceptions=True)
+        self._ingest_workers = []
+
+    async def _ingest_worker(self) -> None:
+        """Index queued documents one at a time, recording the outcome on the summary row."""
+        while True:
+            job = await self._ingest_queue.get()
+            try:
+                # Skip documents deleted while they were waiting
+                if await asyncio.to_thread(
+                    self.summary_collection.find_one, {"_id": job["document_id"]}, {"_id": 1}
+                ):
+                    await self._index_document(job)
+            except Exception as e:
+                logger.error(f"Error indexing document {job['file_name']}: {e}")
+                await asyncio.to_thread(
+                    self.summary_collection.update_one,
+                    {"_id": job["document_id"]},
+                    {"$set": {"status": "failed", "error": str(e)}}
+                )
+            finally:
+                self._ingest_queue.task_done()
+
+    @staticmethod
+    def _routing(category: Optional[str]) -> Optional[str]:
+        """Shard routing value for a category, when category routing is enabled."""
+        return category if KNOWLEDGE_ROUTING_BY_CATEGORY and category else None
+
+    def _bulk_action(self, op_type: str, doc_id: str, category: str, source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build a bulk action for a chunk, routed by its category when enabled."""
+        action = {"_op_type": op_type, "_index": OPENSEARCH_INDEX, "_id": doc_id}
+        if source is not None:
+            action["_source"] = source
+        routing = self._routing(category)
+        if routing is not None:
+            action["_routing"] = routing
+        return action
+
+    def _bulk_index_opensearch(self, opensearch_docs: List[tuple]) -> None:
+        """Index (id, body) pairs into OpenSearch in one _bulk round trip."""
+        helpers.bulk(
+            self.opensearch_client,
+            (
+                self._bulk_action("index", doc_id, doc_body["category"], doc_body)
+                for doc_id, doc_body in opensearch_docs
+            ),
+            chunk_size=500,
+            request_timeout=60
+        )
+
+    def _bulk_upsert_metadata(self, metadata_docs: List[Dict[str, Any]]) -> None:
+        """Upsert chunk documents into DocumentDB with one unordered bulk write (safe to repeat)."""
+        try:
+            self.metadata_collection.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in metadata_docs],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            logger.error(
+                f"DocumentDB bulk upsert failed for {len(e.details.get('writeErrors', []))} "
+                f"of {len(metadata_docs)} chunks: {e.details.get('writeErrors', [])[:3]}"
+            )
+            raise
+
     async def delete_document(self, document_id: str) -> Dict[str, Any]:
         """Delete a document and all its chunks from the knowledge base."""
+        # Every step is a blocking DocumentDB, OpenSearch or filesystem call
+        return await asyncio.to_thread(self._delete_document, document_id)
+
+    def _delete_document(self, document_id: str) -> Dict[str, Any]:
+        """Delete a document and all its chunks (blocking)."""
         try:
             # Find all chunks for this document
             mongo_docs = list(self.metadata_collection.find({"document_id": document_id}))
             
             if not mongo_docs:
-                raise ValueError(f"Document {document_id} not found")
-            
-            # Get OpenSearch document IDs
-            opensearch_ids = [doc["opensearch_doc_id"] for doc in mongo_docs]
+                # Documents still pending (or with no chunks) only have a summary row
+                summary = self.summary_collection.find_one_and_delete({"_id": document_id})
+                if not summary:
+                    raise ValueError(f"Document {document_id} not found")
+                file_path = Path(summary["file_path"])
+                if file_path.exists():
+                    file_path.unlink()
+                return {
+                    "chunks_deleted": 0
+                }
             
-            # Delete from OpenSearch
-            for doc_id in opensearch_ids:
-                self.opensearch_client.delete(
-                    index=OPENSEARCH_INDEX,
-                    id=doc_id
-                )
+            # Delete from OpenSearch in one _bulk round trip (routed like the chunks were indexed)
+            helpers.bulk(
+                self.opensearch_client,
+                (
+                    self._bulk_action("delete", doc["opensearch_doc_id"], doc["category"])
+                    for doc in mongo_docs
+                ),
+                chunk_size=500,
+                request_timeout=60
+            )
+            vector_db.query_cache.clear()
             
             # Delete from DocumentDB
             self.metadata_collection.delete_many({"document_id": document_id})
+            self.summary_collection.delete_one({"_id": document_id})
             
             # Delete file if it exists
             if mongo_docs:
@@ -381,16 +951,21 @@ class KnowledgeManager:
     async def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the knowledge base."""
         try:
-            # OpenSearch stats
-            opensearch_stats = self.opensearch_client.indices.stats(index=OPENSEARCH_INDEX)
+            # OpenSearch and DocumentDB stats, fetched concurrently off the event loop
+            # Backfilled summary rows carry no status; they are indexed documents
+            opensearch_stats, total_documents, pending_documents, total_chunks = await asyncio.gather(
+                asyncio.to_thread(self.opensearch_client.indices.stats, index=OPENSEARCH_INDEX),
+                asyncio.to_thread(
+                    self.summary_collection.count_documents, {"status": {"$nin": ["pending", "failed"]}}
+                ),
+                asyncio.to_thread(self.summary_collection.count_documents, {"status": "pending"}),
+                asyncio.to_thread(self.metadata_collection.count_documents, {})
+            )
             doc_count = opensearch_stats['_all']['total']['docs']['count']
             
-            # DocumentDB stats
-            total_documents = len(list(self.metadata_collection.distinct("document_id")))
-            total_chunks = self.metadata_collection.count_documents({})
-            
             return {
                 "total_documents": total_documents,
+                "pending_documents": pending_documents,
                 "total_chunks": total_chunks,
                 "opensearch_docs": doc_count,
                 "opensearch_index": OPENSEARCH_INDEX
@@ -414,27 +989,12 @@ class KnowledgeManager:
             if document_type:
                 query["document_type"] = document_type
             
-            # Group by document_id to get unique documents
-            pipeline = [
-                {"$match": query},
-                {
-                    "$group": {
-                        "_id": "$document_id",
-                        "file_name": {"$first": "$file_name"},
-                        "file_path": {"$first": "$file_path"},
-                        "document_type": {"$first": "$document_type"},
-                        "category": {"$first": "$category"},
-                        "chunk_count": {"$sum": 1},
-                        "created_at": {"$first": "$created_at"},
-                        "updated_at": {"$max": "$updated_at"},
-                        "total_content_length": {"$sum": "$content_length"}
-                    }
-                },
-                {"$sort": {"created_at": -1}}
-            ]
-            
+            # One summary row per document, newest first
+            summaries = await asyncio.to_thread(
+                lambda: list(self.summary_collection.find(query).sort("created_at", pymongo.DESCENDING))
+            )
             documents = []
-            for doc in self.metadata_collection.aggregate(pipeline):
+            for doc in summaries:
                 documents.append({
                     "document_id": doc["_id"],
                     "file_name": doc["file_name"],
@@ -444,7 +1004,8 @@ class KnowledgeManager:
                     "chunk_count": doc["chunk_count"],
                     "total_content_length": doc["total_content_length"],
                     "created_at": doc["created_at"],
-                    "updated_at": doc["updated_at"]
+                    "updated_at": doc["updated_at"],
+                    "status": doc.get("status", "indexed")
                 })
             
             return documents
@@ -463,31 +1024,37 @@ class KnowledgeManager:
             total_chunks = 0
             
             for doc in documents:
+                # Read the file first: deleting the document also removes it from disk
+                file_path = Path(doc["file_path"])
+                content = None
+                if file_path.exists():
+                    content = await asyncio.to_thread(file_path.read_bytes)
+                
                 # Delete existing chunks
                 await self.delete_document(doc["document_id"])
                 
-                # Re-add document
-                file_path = Path(doc["file_path"])
-                if file_path.exists():
-                    # Simulate UploadFile
-                    with open(file_path, "rb") as f:
-                        content = f.read()
-                    
+                # Re-add document (unchanged files reuse their cached chunk embeddings)
+                if content is not None:
                     # Create a mock UploadFile object
                     class MockUploadFile:
                         def __init__(self, filename, content):
                             self.filename = filename
                             self._content = content
+                            self._offset = 0
                         
-                        async def read(self):
-                            return self._content
+                        async def read(self, size: int = -1):
+                            end = len(self._content) if size < 0 else self._offset + size
+                            chunk = self._content[self._offset:end]
+                            self._offset += len(chunk)
+                            return chunk
                     
                     mock_file = MockUploadFile(doc["file_name"], content)
                     
                     result = await self.add_document(
                         file=mock_file,
                         document_type=doc["document_type"],
-                        category=doc["category"]
+                        category=doc["category"],
+                        background=False
                     )
                     
                     total_processed += 1
@@ -495,6 +1062,9 @@ class KnowledgeManager:
             
             logger.info(f"Reindexed {total_processed} documents with {total_chunks} chunks")
             
+            # Reindexing replaced every segment; reload the graphs before serving searches
+            await asyncio.to_thread(self.warmup)
+            
             return {
                 "documents_processed": total_processed,
                 "chunks_created": total_chunks
@@ -502,4 +1072,10 @@ class KnowledgeManager:
             
         except Exception as e:
             logger.error(f"Error reindexing: {e}")
-            raise    
\ No newline at end of file
+            raise    
+
+
+@lru_cache(maxsize=1)
+def get_knowledge_manager() -> KnowledgeManager:
+    """Return the process-wide KnowledgeManager (FastAPI dependency), creating it on first use."""
+    return KnowledgeManager()
@@ -3,23 +3,26 @@ import os
 import json
 import uvicorn
 import asyncio
+import anyio
 from contextlib import asynccontextmanager
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File, Form, Request
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File, Form, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 
 # Import your modules
 from config import (
-    logger, FRONTEND_URL, agent_storage, memory, embedder, 
-    KNOWLEDGE_SEARCH_CONFIG
+    logger, FRONTEND_URL, agent_storage, memory, embedder, vector_db, documentdb_client,
+    KNOWLEDGE_SEARCH_CONFIG,
+    SETTINGS
 )
-from models import QueryRequest, QueryResponse, KnowledgeDocument
-from agents import legal_system
+from models import QueryRequest, QueryResponse, KnowledgeDocument, KnowledgeBatchSearchRequest
+from agents import get_legal_system
 from websocket_manager import manager
-from utils import _run_and_extract
-from knowledge_manager import KnowledgeManager
+from utils import _run_and_extract, stream_run_content, now_iso
+from knowledge_manager import KnowledgeManager, get_knowledge_manager
+from ttl_cache import TTLCache
 
 
 @asynccontextmanager
@@ -27,14 +30,55 @@ async def lifespan(app: FastAPI):
     """
     Load the AWS Bedrock embedder on startup and clean up on shutdown.
     """
+    # Agent runs and blocking client calls go to worker threads; size both pools for that
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=SETTINGS.worker_threads, thread_name_prefix="worker")
+    )
+    anyio.to_thread.current_default_thread_limiter().total_tokens = SETTINGS.worker_threads
     logger.info("Initializing AWS Bedrock embedder...")
     # The embedder is already initialized in config.py with Bedrock Titan Text Embeddings V2
     # so we just need to make it available to the app
     app.state.embedder = embedder
     logger.info("AWS Bedrock embedder loaded and ready.")
+    # Build the agents once per worker so the first request doesn't pay for it
+    get_legal_system()
+    logger.info("Legal agent system initialized.")
+    # Preload the k-NN graphs so the first agent turn is not a cold search
+    try:
+        await asyncio.to_thread(vector_db.warmup)
+    except Exception as e:
+        logger.warning(f"OpenSearch k-NN warmup failed: {e}")
+    # Create the shared knowledge manager (clients, pools, indexes) before serving
+    knowledge_manager = get_knowledge_manager()
+    await asyncio.to_thread(knowledge_manager.warmup)
+    # Uploads are indexed by background workers on this event loop
+    if SETTINGS.ingest_workers > 0:
+        await knowledge_manager.start_ingest_workers(SETTINGS.ingest_workers)
     yield
     # Clean up resources if needed on shutdown
     logger.info("Application shutting down...")
+    await knowledge_manager.stop_ingest_workers()
+
+class MaxUploadSizeMiddleware:
+    """Reject requests whose Content-Length exceeds max_bytes with 413, before the body is received."""
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_bytes:
+                        response = JSONResponse(
+                            status_code=413,
+                            content={"detail": f"Request body exceeds {self.max_bytes} bytes"}
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
 
 app = FastAPI(
     title="Legal Multi-Agent System with AWS Knowledge Base",
@@ -43,6 +87,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Added before CORS so rejections still carry CORS headers
+app.add_middleware(MaxUploadSizeMiddleware, max_bytes=SETTINGS.max_upload_bytes)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[FRONTEND_URL, "http://localhost:3000"],
@@ -51,7 +98,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-knowledge_manager = KnowledgeManager()
+# Probe results are reused briefly so load balancer checks don't hit the backends each time
+PROBE_TIMEOUT = 0.5
+_probe_cache = TTLCache(maxsize=8, ttl=5)
+
+
+async def _probe(check) -> bool:
+    """Run a blocking connectivity check off the event loop, failing after PROBE_TIMEOUT."""
+    try:
+        return bool(await asyncio.wait_for(asyncio.to_thread(check), timeout=PROBE_TIMEOUT))
+    except Exception:
+        return False
+
+
+async def _probe_services() -> Dict[str, bool]:
+    """Ping DocumentDB and OpenSearch concurrently, memoized for a few seconds."""
+    results = _probe_cache.get("services")
+    if results is None:
+        documentdb_ok, opensearch_ok = await asyncio.gather(
+            _probe(lambda: documentdb_client.admin.command("ping")),
+            _probe(get_knowledge_manager().opensearch_client.ping)
+        )
+        results = {"documentdb": documentdb_ok, "opensearch": opensearch_ok}
+        _probe_cache.set("services", results)
+    return results
+
+# Stream frames are assembled around the JSON-encoded chunk text instead of re-encoding a dict per token
+SSE_CONTENT_PREFIX = 'data: {"content":'
+SSE_DONE_FRAME = 'data: {"done":true}\n\n'
+WS_CONTENT_PREFIX = '{"content":'
+WS_DONE_MESSAGE = '{"done":true}'
 
 # --- API Endpoints ---
 
@@ -79,24 +155,14 @@ async def root():
 async def health_check():
     """Health check endpoint for AWS load balancer."""
     try:
-        # Test DocumentDB connection
-        agent_storage_health = "healthy"
-        try:
-            # Quick connection test
-            list(agent_storage.read("health_check"))
-        except:
-            agent_storage_health = "degraded"
-        
-        # Test OpenSearch connection  
-        opensearch_health = "healthy"
-        try:
-            await knowledge_manager.get_stats()
-        except:
-            opensearch_health = "degraded"
+        # Cheap pings, shared across probes for a few seconds
+        services = await _probe_services()
+        agent_storage_health = "healthy" if services["documentdb"] else "degraded"
+        opensearch_health = "healthy" if services["opensearch"] else "degraded"
         
         return {
             "status": "healthy",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now_iso(),
             "services": {
                 "document_db": agent_storage_health,
                 "vector_db": opensearch_health,
@@ -111,7 +177,7 @@ async def health_check():
 async def get_agents():
     return {
         "agents": {
-            name: agent.instructions for name, agent in legal_system.agents.items()
+            name: agent.instructions for name, agent in get_legal_system().agents.items()
         },
         "team_available": True,
         "aws_integration": {
@@ -124,24 +190,32 @@ async def get_agents():
 @app.post("/query", response_model=QueryResponse)
 async def process_query(request: QueryRequest):
     try:
-        agent_or_team = legal_system.team if request.agent_type == "team" else legal_system.agents.get(request.agent_type)
+        # A fresh agent per request; concurrent runs would clobber each other's session
+        agent_or_team = get_legal_system().create_runner(request.agent_type)
         if not agent_or_team:
             raise HTTPException(status_code=400, detail="Invalid agent type")
         
         agent_name = "Legal Team" if request.agent_type == "team" else agent_or_team.name
-        agent_or_team.session_id = request.session_id
-        agent_or_team.user_id = request.user_id
 
         # Log knowledge search for monitoring
         logger.info(f"Processing query with AWS Bedrock and OpenSearch: {request.message[:100]}...")
 
-        content, tool_calls = _run_and_extract(agent_or_team, request.message, stream=False)
+        # The run blocks for the whole generation, so it goes to a worker thread
+        content, tool_calls = await asyncio.to_thread(
+            _run_and_extract,
+            agent_or_team,
+            request.message,
+            stream=False,
+            session_id=request.session_id,
+            user_id=request.user_id
+        )
 
+        # The agent belongs to this request, so its run response carries this run's session
+        run_response = getattr(agent_or_team, "run_response", None)
         return QueryResponse(
             response=content,
             agent_name=agent_name,
-            session_id=getattr(agent_or_team, "session_id", "default") or "default",
-            timestamp=datetime.now(),
+            session_id=request.session_id or getattr(run_response, "session_id", None) or "default",
             tool_calls=tool_calls,
         )
     except Exception as e:
@@ -151,21 +225,27 @@ async def process_query(request: QueryRequest):
 @app.post("/query/stream")
 async def process_query_stream(request: QueryRequest):
     try:
-        agent_or_team = legal_system.team if request.agent_type == "team" else legal_system.agents.get(request.agent_type)
+        # A fresh agent per request; concurrent runs would clobber each other's session
+        agent_or_team = get_legal_system().create_runner(request.agent_type)
         if not agent_or_team:
             raise HTTPException(status_code=400, detail="Invalid agent type")
         
         agent_name = "Legal Team" if request.agent_type == "team" else agent_or_team.name
-        agent_or_team.session_id = request.session_id
-        agent_or_team.user_id = request.user_id
 
-        def generate_response():
-            run_iter, _ = _run_and_extract(agent_or_team, request.message, stream=True)
-            for chunk in run_iter:
-                chunk_content = getattr(chunk, "content", "")
-                if chunk_content:
-                    yield f"data: {json.dumps({'content': chunk_content, 'agent': agent_name})}\n\n"
-            yield f"data: {json.dumps({'done': True})}\n\n"
+        async def generate_response():
+            frame_suffix = f',"agent":{json.dumps(agent_name)}}}\n\n'
+            # The run stream blocks between tokens, so it is consumed in a worker thread
+            async for chunk_content in stream_run_content(
+                lambda: _run_and_extract(
+                    agent_or_team,
+                    request.message,
+                    stream=True,
+                    session_id=request.session_id,
+                    user_id=request.user_id
+                )[0]
+            ):
+                yield SSE_CONTENT_PREFIX + json.dumps(chunk_content) + frame_suffix
+            yield SSE_DONE_FRAME
 
         return StreamingResponse(generate_response(), media_type="text/event-stream")
     except Exception as e:
@@ -196,7 +276,8 @@ async def get_user_memories(user_id: str):
 async def upload_document(
     file: UploadFile = File(...),
     document_type: str = Form(...),
-    category: str = Form(default="general")
+    category: str = Form(default="general"),
+    knowledge_manager: KnowledgeManager = Depends(get_knowledge_manager)
 ):
     """Upload a new document to the AWS knowledge base (OpenSearch + DocumentDB)."""
     try:
@@ -221,9 +302,15 @@ async def upload_document(
             category=category
         )
         
+        if result["status"] == "pending":
+            message = "Document uploaded and queued for indexing with AWS Bedrock embeddings"
+        else:
+            message = "Document uploaded and processed successfully with AWS Bedrock embeddings"
+        
         return {
-            "message": "Document uploaded and processed successfully with AWS Bedrock embeddings",
+            "message": message,
             "document_id": result["document_id"],
+            "status": result["status"],
             "chunks_created": result["chunks_created"],
             "file_name": file.filename,
             "services_used": {
@@ -237,7 +324,11 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/knowledge/documents")
-async def list_documents(category: str = None, document_type: str = None):
+async def list_documents(
+    category: str = None,
+    document_type: str = None,
+    knowledge_manager: KnowledgeManager = Depends(get_knowledge_manager)
+):
     """List all documents in the AWS knowledge base."""
     try:
         documents = await knowledge_manager.list_documents(
@@ -258,7 +349,10 @@ async def list_documents(category: str = None, document_type: str = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/knowledge/documents/{document_id}")
-async def delete_document(document_id: str):
+async def delete_document(
+    document_id: str,
+    knowledge_manager: KnowledgeManager = Depends(get_knowledge_manager)
+):
     """Delete a document from the AWS knowledge base."""
     try:
         result = await knowledge_manager.delete_document(document_id)
@@ -273,10 +367,11 @@ async def delete_document(document_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/knowledge/stats")
-async def get_knowledge_stats():
+async def get_knowledge_stats(knowledge_manager: KnowledgeManager = Depends(get_knowledge_manager)):
     """Get statistics about the AWS knowledge base."""
     try:
         stats = await knowledge_manager.get_stats()
+        stats["query_cache"] = vector_db.query_cache.get_stats()
         stats["aws_services"] = {
             "vector_database": "Amazon OpenSearch Service",
             "document_database": "Amazon DocumentDB", 
@@ -289,7 +384,7 @@ async def get_knowledge_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/knowledge/reindex")
-async def reindex_knowledge_base():
+async def reindex_knowledge_base(knowledge_manager: KnowledgeManager = Depends(get_knowledge_manager)):
     """Reindex the entire AWS knowledge base with fresh embeddings."""
     try:
         result = await knowledge_manager.reindex_all()
@@ -305,7 +400,12 @@ async def reindex_knowledge_base():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/knowledge/search")
-async def search_knowledge(query: str, limit: int = 5, similarity_threshold: float = 0.7):
+async def search_knowledge(
+    query: str,
+    limit: int = SETTINGS.max_search_results,
+    similarity_threshold: float = SETTINGS.search_similarity_threshold,
+    knowledge_manager: KnowledgeManager = Depends(get_knowledge_manager)
+):
     """Search the AWS knowledge base using OpenSearch vector similarity."""
     try:
         results = await knowledge_manager.search_knowledge(
@@ -328,6 +428,36 @@ async def search_knowledge(query: str, limit: int = 5, similarity_threshold: flo
         logger.exception("Error searching AWS knowledge base")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/knowledge/search/batch")
+async def batch_search_knowledge(
+    request: KnowledgeBatchSearchRequest,
+    knowledge_manager: KnowledgeManager = Depends(get_knowledge_manager)
+):
+    """Search the AWS knowledge base for several queries in one OpenSearch round trip."""
+    try:
+        results = await knowledge_manager.search_knowledge_batch(
+            queries=request.queries,
+            limit=request.limit,
+            similarity_threshold=request.similarity_threshold,
+            document_type=request.document_type,
+            category=request.category
+        )
+        return {
+            "results": [
+                {"query": query, "results": query_results, "total_found": len(query_results)}
+                for query, query_results in zip(request.queries, results)
+            ],
+            "search_info": {
+                "embedding_model": "amazon.titan-embed-text-v2:0",
+                "vector_database": "Amazon OpenSearch Service",
+                "similarity_algorithm": "cosine",
+                "threshold": request.similarity_threshold
+            }
+        }
+    except Exception as e:
+        logger.exception("Error batch searching AWS knowledge base")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/aws/status")
 async def aws_services_status():
     """Check the status of AWS services integration."""
@@ -340,19 +470,16 @@ async def aws_services_status():
             "llm": "gpt-oss:120b"
         }
         
-        # Test each service
-        try:
-            stats = await knowledge_manager.get_stats()
-            status["opensearch_docs"] = stats.get("opensearch_docs", 0)
-        except:
+        # Test each service with a ping rather than a stats query
+        services = await _probe_services()
+        if not services["opensearch"]:
             status["opensearch"] = "error"
-            
-        try:
-            list(agent_storage.read("test"))
+        
+        if services["documentdb"]:
             status["documentdb_collections"] = ["agent_data", "agent_memories", "knowledge_metadata"]
-        except:
+        else:
             status["documentdb"] = "error"
-            
+        
         return status
     except Exception as e:
         logger.exception("Error checking AWS services status")
@@ -368,20 +495,20 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             query = message_data.get("message", "")
             agent_type = message_data.get("agent_type", "legal_advisor")
 
-            agent_or_team = legal_system.team if agent_type == "team" else legal_system.agents.get(agent_type)
-            agent_or_team.session_id = session_id
-            agent_or_team.user_id = message_data.get("user_id")
-
-            run_iter, _ = _run_and_extract(agent_or_team, query, stream=True)
-            for chunk in run_iter:
-                if content := getattr(chunk, "content", ""):
-                    await manager.send_personal_message(json.dumps({
-                        "content": content,
-                        "agent": getattr(agent_or_team, 'name', 'Legal Team'),
-                        "timestamp": datetime.now().isoformat(),
-                        "aws_powered": True
-                    }), websocket)
-            await manager.send_personal_message(json.dumps({"done": True}), websocket)
+            agent_or_team = get_legal_system().create_runner(agent_type)
+            user_id = message_data.get("user_id")
+
+            agent_field = f',"agent":{json.dumps(getattr(agent_or_team, "name", "Legal Team"))}'
+            async for content in stream_run_content(
+                lambda: _run_and_extract(
+                    agent_or_team, query, stream=True, session_id=session_id, user_id=user_id
+                )[0]
+            ):
+                await manager.send_personal_message(
+                    f'{WS_CONTENT_PREFIX}{json.dumps(content)}{agent_field},"timestamp":"{now_iso()}","aws_powered":true}}',
+                    websocket
+                )
+            await manager.send_personal_message(WS_DONE_MESSAGE, websocket)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
@@ -389,8 +516,17 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         await manager.send_personal_message(json.dumps({"error": str(e)}), websocket)
 
 if __name__ == "__main__":
+    # Single process by default: caches are per process (see Settings.web_concurrency).
+    # Each worker imports the app and builds its own clients and pools.
+    # "auto" picks uvloop and httptools when installed (uvicorn[standard]).
     uvicorn.run(
-        app,
+        "main:app",
         host=os.getenv("API_HOST", "0.0.0.0"),
-        port=int(os.getenv("API_PORT", 8000))
+        port=int(os.getenv("API_PORT", 8000)),
+        workers=SETTINGS.web_concurrency,
+        loop="auto",
+        http="auto",
+        log_level="info",
+        backlog=4096,
+        timeout_keep_alive=30
     )
\ No newline at end of file
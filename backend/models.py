@@ -1,9 +1,19 @@
 # models.py
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+
+# Shared by every API model: unknown fields are dropped and no per-field transforms run
+MODEL_CONFIG = ConfigDict(
+    extra="ignore",
+    str_strip_whitespace=False,
+    validate_assignment=False,
+    populate_by_name=True
+)
 
 class QueryRequest(BaseModel):
+    model_config = MODEL_CONFIG
+
     message: str
     agent_type: Optional[str] = "team"
     session_id: Optional[str] = None
@@ -12,14 +22,18 @@ class QueryRequest(BaseModel):
     knowledge_search_limit: Optional[int] = 5
 
 class QueryResponse(BaseModel):
+    model_config = MODEL_CONFIG
+
     response: str
     agent_name: str
     session_id: str
-    timestamp: datetime
-    tool_calls: List[Dict[str, Any]] = []
-    knowledge_sources: List[Dict[str, Any]] = []
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    tool_calls: List[Dict[str, Any]] = Field(default_factory=list)
+    knowledge_sources: List[Dict[str, Any]] = Field(default_factory=list)
 
 class KnowledgeDocument(BaseModel):
+    model_config = MODEL_CONFIG
+
     id: str
     file_name: str
     file_path: str
@@ -29,9 +43,11 @@ class KnowledgeDocument(BaseModel):
     chunk_count: int
     created_at: datetime
     updated_at: datetime
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = Field(default_factory=dict)
 
 class KnowledgeSearchResult(BaseModel):
+    model_config = MODEL_CONFIG
+
     document_id: str
     chunk_id: str
     content: str
@@ -39,16 +55,29 @@ class KnowledgeSearchResult(BaseModel):
     file_name: str
     document_type: str
     category: str
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = Field(default_factory=dict)
 
 class DocumentUploadRequest(BaseModel):
+    model_config = MODEL_CONFIG
+
     document_type: str
     category: Optional[str] = "general"
-    metadata: Optional[Dict[str, Any]] = {}
+    metadata: Optional[Dict[str, Any]] = Field(default_factory=dict)
 
 class KnowledgeSearchRequest(BaseModel):
+    model_config = MODEL_CONFIG
+
     query: str
     limit: Optional[int] = 5
     similarity_threshold: Optional[float] = 0.7
     document_type: Optional[str] = None
+    category: Optional[str] = None
+
+class KnowledgeBatchSearchRequest(BaseModel):
+    model_config = MODEL_CONFIG
+
+    queries: List[str]
+    limit: Optional[int] = 5
+    similarity_threshold: Optional[float] = 0.7
+    document_type: Optional[str] = None
     category: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,34 @@
+# opensearch_serializer.py
+"""
+JSON serializer for the OpenSearch clients.
+Encodes request bodies (bulk action lines, search bodies) with one prebuilt
+encoder instead of constructing a new json.JSONEncoder on every call.
+"""
+
+import json
+from typing import Any
+from opensearchpy.exceptions import SerializationError
+from opensearchpy.serializer import JSONSerializer
+
+
+class CompactJSONSerializer(JSONSerializer):
+    """JSONSerializer that reuses a single compact, non-ASCII-escaping encoder."""
+
+    def __init__(self):
+        self._encode = json.JSONEncoder(
+            default=self.default,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            # Bodies are plain trees built by this code; skip cycle tracking
+            check_circular=False
+        ).encode
+
+    def dumps(self, data: Any) -> Any:
+        # Strings are already serialized bodies
+        if isinstance(data, str):
+            return data
+
+        try:
+            return self._encode(data)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(data, e)
@@ -5,12 +5,144 @@ Amazon OpenSearch Service vector database implementation for Agno framework.
 
 import json
 import uuid
-from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
+import operator
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Optional
 import boto3
 from opensearchpy import OpenSearch, RequestsHttpConnection
+from opensearchpy.helpers import bulk, parallel_bulk
+from pymongo.collection import Collection
 from requests_aws4auth import AWS4Auth
 from agno.vectordb.base import VectorDb
 from agno.document import Document
+from aws_embedder import normalize_embedding, quantize_embedding, trim_embedding
+from opensearch_serializer import CompactJSONSerializer
+from ttl_cache import QueryCache
+
+# Descriptive DocumentDB chunk fields carried into the metadata of hydrated search results
+HYDRATED_META_FIELDS = ("file_name", "document_type", "category", "chunk_index", "total_chunks")
+
+
+def build_index_body(
+    dimensions: int = 1024,
+    engine: str = "faiss",
+    data_type: str = "float",
+    ef_search: int = 512,
+    settings: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Mappings and settings of the knowledge index, shared by the agents' vector DB,
+    the knowledge manager and the seed script.
+    
+    Args:
+        dimensions: Vector dimensions
+        engine: k-NN engine ("faiss" or "lucene")
+        data_type: "float", or "byte" for int8-quantized vectors (OpenSearch 2.17+)
+        ef_search: HNSW candidate list size at query time
+        settings: Extra index settings (e.g. bulk-load settings)
+    """
+    parameters: Dict[str, Any] = {"m": 16, "ef_construction": 256}
+    if engine == "faiss" and data_type == "float":
+        # fp16 scalar quantization halves vector memory
+        parameters["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+    vector_mapping = {
+        "type": "knn_vector",
+        "dimension": dimensions,
+        "method": {
+            "name": "hnsw",
+            # Embeddings are unit length, so inner product ranks like cosine
+            "space_type": "innerproduct",
+            "engine": engine,
+            "parameters": parameters
+        }
+    }
+    if data_type == "byte":
+        vector_mapping["data_type"] = "byte"
+    
+    return {
+        "mappings": {
+            # Documents may carry a custom routing value (see routing_field)
+            "_routing": {"required": False},
+            "properties": {
+                "vector": vector_mapping,
+                # Agent knowledge documents
+                "content": {"type": "text"},
+                "metadata": {"type": "object"},
+                "doc_id": {"type": "keyword"},
+                # Knowledge manager and seeded chunks: filter fields and the DocumentDB
+                # join key only; their content and descriptive metadata live in DocumentDB
+                "document_type": {"type": "keyword"},
+                "category": {"type": "keyword"},
+                "mongo_doc_id": {"type": "keyword"}
+            }
+        },
+        "settings": {
+            "index": {
+                "knn": True,
+                "knn.algo_param.ef_search": ef_search,
+                # Always build graphs for new segments so searches stay approximate
+                "knn.advanced.approximate_threshold": 0,
+                **(settings or {})
+            }
+        }
+    }
+
+
+@lru_cache(maxsize=None)
+def get_aws4auth(region: str, service: str = 'es') -> AWS4Auth:
+    """
+    Return the shared SigV4 signer for a region/service.
+    
+    Built from boto3's refreshable credentials, so rotated (e.g. instance role)
+    credentials are picked up; the derived signing key is reused until the
+    date or credentials change instead of being rebuilt per client.
+    """
+    credentials = boto3.Session().get_credentials()
+    return AWS4Auth(region=region, service=service, refreshable_credentials=credentials)
+
+
+def mmr_select(
+    query_vector: List[float],
+    vectors: List[List[float]],
+    limit: int,
+    mmr_lambda: float
+) -> List[int]:
+    """
+    Pick `limit` vectors by maximal marginal relevance.
+    
+    Each step takes the candidate maximizing
+    mmr_lambda * sim(query, d) - (1 - mmr_lambda) * max(sim(d, selected)).
+    
+    Returns:
+        Indices into vectors, in selection order
+    """
+    def dot(a: List[float], b: List[float]) -> float:
+        return sum(map(operator.mul, a, b))
+    
+    query_vector = normalize_embedding(query_vector)
+    vectors = [normalize_embedding(vector) for vector in vectors]
+    relevance = [dot(query_vector, vector) for vector in vectors]
+    # Highest similarity of each candidate to anything already selected
+    redundancy = [0.0] * len(vectors)
+    
+    selected: List[int] = []
+    candidates = list(range(len(vectors)))
+    while candidates and len(selected) < limit:
+        best = max(
+            candidates,
+            key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy[i]
+        )
+        selected.append(best)
+        candidates.remove(best)
+        for i in candidates:
+            similarity = dot(vectors[i], vectors[best])
+            if len(selected) == 1 or similarity > redundancy[i]:
+                redundancy[i] = similarity
+    
+    return selected
 
 
 class OpenSearchVectorDb(VectorDb):
@@ -25,6 +157,15 @@ class OpenSearchVectorDb(VectorDb):
         password: Optional[str] = None,
         use_aws_auth: bool = True,
         dimensions: int = 1024,
+        ef_search: int = 512,
+        engine: str = "faiss",
+        data_type: str = "float",
+        embedding_workers: int = 16,
+        cache_size: int = 2000,
+        cache_ttl: float = 300,
+        mmr_lambda: Optional[float] = 0.5,
+        routing_field: Optional[str] = None,
+        content_collection: Optional[Collection] = None,
         **kwargs
     ):
         """
@@ -38,24 +179,35 @@ class OpenSearchVectorDb(VectorDb):
             password: Password for basic auth (if not using AWS auth)
             use_aws_auth: Whether to use AWS IAM authentication
             dimensions: Vector dimensions
+            ef_search: HNSW candidate list size at query time
+            engine: k-NN engine for new indexes ("faiss" or "lucene")
+            data_type: "float", or "byte" to store int8-quantized vectors (OpenSearch 2.17+)
+            embedding_workers: Concurrent embedding requests for documents inserted without embeddings
+            cache_size: Number of search results kept in the query cache
+            cache_ttl: Seconds a cached search result is served
+            mmr_lambda: Relevance/diversity trade-off for MMR re-ranking of results (None disables it)
+            routing_field: Metadata field whose value routes documents (and searches filtered on it) to one shard
+            content_collection: DocumentDB collection holding the content of entries indexed by the
+                knowledge manager, which keeps only vectors, filter fields and mongo_doc_id in OpenSearch
         """
         super().__init__(**kwargs)
         self.endpoint = endpoint.replace('https://', '')
         self.index_name = index_name
         self.region = region
         self.dimensions = dimensions
+        self.ef_search = ef_search
+        self.data_type = data_type
+        self.embedding_workers = embedding_workers
+        self.mmr_lambda = mmr_lambda
+        self.routing_field = routing_field
+        self.content_collection = content_collection
+        
+        # (query, limit, filters) -> results; cleared whenever the index is written
+        self.query_cache = QueryCache(maxsize=cache_size, ttl=cache_ttl)
         
         # Setup authentication
         if use_aws_auth:
-            credentials = boto3.Session().get_credentials()
-            awsauth = AWS4Auth(
-                credentials.access_key,
-                credentials.secret_key,
-                region,
-                'es',
-                session_token=credentials.token
-            )
-            http_auth = awsauth
+            http_auth = get_aws4auth(region)
         else:
             http_auth = (username, password) if username and password else None
         
@@ -65,84 +217,276 @@ class OpenSearchVectorDb(VectorDb):
             http_auth=http_auth,
             use_ssl=True,
             verify_certs=True,
-            connection_class=RequestsHttpConnection
+            connection_class=RequestsHttpConnection,
+            serializer=CompactJSONSerializer()
         )
         
         # Ensure index exists
-        self._create_index_if_not_exists()
+        self._create_index_if_not_exists(engine)
+        # Filtering strategy depends on the engine the index was created with
+        self.engine = self._get_knn_engine(default=engine)
     
-    def _create_index_if_not_exists(self):
+    def _create_index_if_not_exists(self, engine: str):
         """Create index with proper vector mapping if it doesn't exist."""
         if not self.client.indices.exists(index=self.index_name):
-            index_mapping = {
-                "mappings": {
-                    "properties": {
-                        "vector": {
-                            "type": "knn_vector",
-                            "dimension": self.dimensions,
-                            "method": {
-                                "name": "hnsw",
-                                "space_type": "cosinesimil",
-                                "engine": "nmslib"
-                            }
-                        },
-                        "content": {"type": "text"},
-                        "metadata": {"type": "object"},
-                        "doc_id": {"type": "keyword"}
-                    }
-                },
-                "settings": {
-                    "index": {
-                        "knn": True,
-                        "knn.algo_param.ef_search": 512
-                    }
-                }
-            }
-            
             self.client.indices.create(
                 index=self.index_name,
-                body=index_mapping
+                body=build_index_body(self.dimensions, engine, self.data_type, self.ef_search)
             )
     
+    def _get_knn_engine(self, default: str) -> str:
+        """Return the k-NN engine of the index's vector field (existing indexes may use nmslib)."""
+        try:
+            mapping = self.client.indices.get_mapping(index=self.index_name)
+            properties = next(iter(mapping.values()))["mappings"]["properties"]
+            return properties["vector"].get("method", {}).get("engine", "nmslib")
+        except Exception as e:
+            print(f"Warning: Could not read k-NN engine for {self.index_name}, assuming {default}: {e}")
+            return default
+    
+    def _index_vector(self, vector: List[float]) -> List[float]:
+        """Convert an embedding to the index's vector data type."""
+        if self.data_type == "byte":
+            return quantize_embedding(vector)
+        return trim_embedding(vector)
+    
+    def warmup(self) -> None:
+        """
+        Load the index's k-NN graphs into native memory and run one search,
+        so the first user query does not pay for lazy graph loading.
+        Index settings are left as the index was created with.
+        """
+        self.client.transport.perform_request(
+            "GET",
+            f"/_plugins/_knn/warmup/{self.index_name}"
+        )
+        
+        # Fixed unit vector: exercises the search path without a Bedrock call
+        warmup_vector = [1.0] + [0.0] * (self.dimensions - 1)
+        self._search_by_vector(warmup_vector, limit=1)
+    
+    def _embed_missing(self, documents: List[Document]) -> None:
+        """Embed documents that have no embedding yet with concurrent Bedrock calls."""
+        # Longest first so a large chunk doesn't start last and straggle
+        to_embed = sorted(
+            (doc for doc in documents if not doc.embedding),
+            key=lambda doc: len(doc.content),
+            reverse=True
+        )
+        if not to_embed:
+            return
+        if not self.embedder:
+            raise ValueError("Document has no embedding and no embedder provided")
+        
+        with ThreadPoolExecutor(max_workers=self.embedding_workers) as executor:
+            embeddings = executor.map(self.embedder.get_embedding, [doc.content for doc in to_embed])
+            for doc, embedding in zip(to_embed, embeddings):
+                doc.embedding = embedding
+    
     def insert(self, documents: List[Document]) -> None:
-        """Insert documents into OpenSearch."""
-        for doc in documents:
-            if not doc.embedding:
-                if self.embedder:
-                    doc.embedding = self.embedder.get_embedding(doc.content)
-                else:
-                    raise ValueError("Document has no embedding and no embedder provided")
-            
-            doc_id = doc.id or str(uuid.uuid4())
-            
-            opensearch_doc = {
-                "vector": doc.embedding,
+        """Insert documents into OpenSearch with batched _bulk requests."""
+        self._embed_missing(documents)
+        
+        actions = (
+            self.document_action(doc, doc_id=doc.id or str(uuid.uuid4()))
+            for doc in documents
+        )
+        _, errors = bulk(
+            self.client,
+            actions,
+            chunk_size=500,
+            request_timeout=120,
+            raise_on_error=False
+        )
+        self.query_cache.clear()
+        for error in errors:
+            print(f"Warning: Bulk indexing failed: {error}")
+    
+    def upsert(self, documents: List[Document]) -> None:
+        """Upsert documents through the bulk API, keyed by id or content hash."""
+        self._embed_missing(documents)
+        
+        self.bulk_upsert(self.document_action(doc) for doc in documents)
+    
+    def document_action(self, doc: Document, doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """Build a bulk index action for an embedded document."""
+        # Content hash keeps re-ingestion of the same chunk idempotent
+        doc_id = doc_id or doc.id or hashlib.md5(doc.content.encode('utf-8')).hexdigest()
+        
+        action = {
+            "_op_type": "index",
+            "_index": self.index_name,
+            "_id": doc_id,
+            "_source": {
+                "vector": self._index_vector(doc.embedding),
                 "content": doc.content,
                 "metadata": doc.meta or {},
                 "doc_id": doc_id
             }
-            
-            self.client.index(
-                index=self.index_name,
-                id=doc_id,
-                body=opensearch_doc
-            )
+        }
+        routing = self._routing((doc.meta or {}).get(self.routing_field) if self.routing_field else None)
+        if routing is not None:
+            action["_routing"] = routing
+        return action
     
-    def upsert(self, documents: List[Document]) -> None:
-        """Upsert documents (same as insert for OpenSearch)."""
-        self.insert(documents)
+    @staticmethod
+    def _routing(value: Any) -> Optional[str]:
+        """Routing string for a routing field value (None leaves routing to the document id)."""
+        return None if value is None else str(value)
+    
+    def _search_routing(self, filters: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Route searches filtered on the routing field to that value's shard."""
+        if self.routing_field and filters:
+            return self._routing(filters.get(self.routing_field))
+        return None
+    
+    def bulk_upsert(
+        self,
+        actions: Iterable[Dict[str, Any]],
+        thread_count: int = 4,
+        chunk_size: int = 500
+    ) -> int:
+        """
+        Index a stream of bulk actions with parallel _bulk requests.
+        
+        Args:
+            actions: Bulk actions, e.g. from document_action()
+            thread_count: Concurrent _bulk requests
+            chunk_size: Actions per _bulk request
+            
+        Returns:
+            Number of documents indexed
+        """
+        indexed = 0
+        for ok, item in parallel_bulk(
+            self.client,
+            actions,
+            thread_count=thread_count,
+            chunk_size=chunk_size,
+            queue_size=8,
+            raise_on_error=False,
+            request_timeout=120
+        ):
+            if ok:
+                indexed += 1
+            else:
+                print(f"Warning: Bulk indexing failed: {item}")
+        
+        self.query_cache.clear()
+        return indexed
     
     def search(
         self,
         query: str,
         limit: int = 10,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        include_vectors: bool = False
     ) -> List[Document]:
-        """Search for similar documents."""
+        """
+        Search for similar documents, serving repeated searches from the query cache.
+        
+        Returned documents carry no embedding unless include_vectors is set.
+        """
         if not self.embedder:
             raise ValueError("Embedder required for search")
         
-        query_vector = self.embedder.get_embedding(query)
+        if include_vectors:
+            # Cached results are vector-free, so these searches bypass the cache
+            query_vector = self.embedder.get_embedding(query)
+            return self._search_by_vector(query_vector, limit, filters, include_vectors=True)
+        
+        key = self._cache_key(query, limit, filters)
+        documents = self.query_cache.get(key)
+        if documents is None:
+            query_vector = self.embedder.get_embedding(query)
+            documents = self._search_by_vector(query_vector, limit, filters)
+            self.query_cache.set(key, documents)
+        return list(documents)
+    
+    def batch_search(
+        self,
+        queries: List[str],
+        limit: int = 10,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Document]]:
+        """Search several queries with concurrent embedding and one _msearch request."""
+        if not self.embedder:
+            raise ValueError("Embedder required for search")
+        
+        keys = [self._cache_key(query, limit, filters) for query in queries]
+        results = [self.query_cache.get(key) for key in keys]
+        missing = [i for i, documents in enumerate(results) if documents is None]
+        
+        if missing:
+            # The embedder fans a list of texts out over its thread pool
+            query_vectors = self.embedder.get_embedding([queries[i] for i in missing])
+            
+            header = {"index": self.index_name}
+            routing = self._search_routing(filters)
+            if routing is not None:
+                header["routing"] = routing
+            
+            body = []
+            for query_vector in query_vectors:
+                body.append(header)
+                body.append(self._build_search_body(
+                    query_vector, self._fetch_size(limit), filters, with_vectors=self._use_mmr(limit)
+                ))
+            response = self.client.msearch(body=body)
+            
+            hit_lists = {}
+            for i, query_vector, item in zip(missing, query_vectors, response['responses']):
+                if 'error' in item:
+                    print(f"Warning: Search for '{queries[i]}' failed: {item['error']}")
+                    results[i] = []
+                    continue
+                hit_lists[i] = self._rerank(query_vector, item['hits']['hits'], limit)
+            
+            # One DocumentDB round trip hydrates the hits of every query
+            self._hydrate([hit for hits in hit_lists.values() for hit in hits])
+            for i, hits in hit_lists.items():
+                results[i] = self._to_documents(hits)
+                self.query_cache.set(keys[i], results[i])
+        
+        return [list(documents) for documents in results]
+    
+    @staticmethod
+    def _cache_key(query: str, limit: int, filters: Optional[Dict[str, Any]]) -> bytes:
+        """Query cache key for a search."""
+        return hashlib.blake2b(
+            f"{query}\0{json.dumps(filters, sort_keys=True)}\0{limit}".encode('utf-8'),
+            digest_size=16
+        ).digest()
+    
+    def _use_mmr(self, limit: int) -> bool:
+        """Whether results for this limit are MMR re-ranked."""
+        return self.mmr_lambda is not None and limit > 1
+    
+    def _fetch_size(self, limit: int) -> int:
+        """Candidates to fetch for a search returning `limit` results."""
+        return max(limit * 3, 20) if self._use_mmr(limit) else limit
+    
+    def _rerank(self, query_vector: List[float], hits: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Reduce fetched candidates to `limit` diverse hits with MMR (or keep them as ranked)."""
+        if not self._use_mmr(limit) or len(hits) <= limit:
+            return hits[:limit]
+        selected = mmr_select(
+            query_vector,
+            [hit['_source']['vector'] for hit in hits],
+            limit,
+            self.mmr_lambda
+        )
+        return [hits[i] for i in selected]
+    
+    def _build_search_body(
+        self,
+        query_vector: List[float],
+        limit: int,
+        filters: Optional[Dict[str, Any]] = None,
+        with_vectors: bool = False
+    ) -> Dict[str, Any]:
+        """Build the k-NN search body for an embedded query."""
+        query_vector = self._index_vector(query_vector)
         
         # Build search query
         must_clauses = []
@@ -150,56 +494,134 @@ class OpenSearchVectorDb(VectorDb):
             for key, value in filters.items():
                 must_clauses.append({"term": {f"metadata.{key}": value}})
         
-        search_body = {
-            "size": limit,
-            "query": {
-                "script_score": {
-                    "query": {
-                        "bool": {"must": must_clauses}
-                    } if must_clauses else {"match_all": {}},
-                    "script": {
-                        "source": "cosineSimilarity(params.query_vector, 'vector') + 1.0",
-                        "params": {"query_vector": query_vector}
+        search_body = {"size": limit}
+        if not with_vectors:
+            # Callers only need content and metadata; don't ship the vectors back
+            search_body["_source"] = {"excludes": ["vector"]}
+        
+        # Approximate k-NN over the HNSW graph
+        if self.engine in ("faiss", "lucene"):
+            # Filters are applied during graph traversal
+            knn_params = {"vector": query_vector, "k": limit}
+            if must_clauses:
+                knn_params["filter"] = {"bool": {"must": must_clauses}}
+            search_body["query"] = {"knn": {"vector": knn_params}}
+        else:
+            # nmslib has no efficient filtering, so filters are applied to an oversampled candidate set
+            knn_query = {
+                "knn": {
+                    "vector": {
+                        "vector": query_vector,
+                        "k": limit * 10 if must_clauses else limit
                     }
                 }
             }
-        }
+            search_body["query"] = {
+                "bool": {
+                    "must": [knn_query],
+                    "filter": must_clauses
+                }
+            } if must_clauses else knn_query
         
-        response = self.client.search(
-            index=self.index_name,
-            body=search_body
-        )
+        return search_body
+    
+    def _hydrate(self, hits: List[Dict[str, Any]]) -> None:
+        """Fill in content and metadata of knowledge manager entries from DocumentDB, in place."""
+        if self.content_collection is None:
+            return
+        pending = {
+            hit['_source']['mongo_doc_id']: hit['_source']
+            for hit in hits
+            if 'content' not in hit['_source'] and hit['_source'].get('mongo_doc_id')
+        }
+        if not pending:
+            return
         
-        # Convert results to Document objects
+        for chunk in self.content_collection.find(
+            {"_id": {"$in": list(pending)}},
+            {"content": 1, "metadata": 1, **{field: 1 for field in HYDRATED_META_FIELDS}}
+        ):
+            source = pending[chunk["_id"]]
+            source['doc_id'] = chunk["_id"]
+            source['content'] = chunk.get("content", "")
+            # Seeded chunks keep these fields only at the top level, not in their metadata
+            meta = {field: chunk[field] for field in HYDRATED_META_FIELDS if field in chunk}
+            meta.update(chunk.get("metadata") or {})
+            source['metadata'] = meta
+    
+    @staticmethod
+    def _to_documents(hits: List[Dict[str, Any]], include_vectors: bool = False) -> List[Document]:
+        """Convert search hits to Document objects."""
         documents = []
-        for hit in response['hits']['hits']:
+        for hit in hits:
             source = hit['_source']
             doc = Document(
                 id=source.get('doc_id'),
                 content=source.get('content', ''),
                 meta=source.get('metadata', {}),
-                embedding=source.get('vector')
+                embedding=source.get('vector') if include_vectors else None
             )
             documents.append(doc)
         
         return documents
     
+    def _search_by_vector(
+        self,
+        query_vector: List[float],
+        limit: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        include_vectors: bool = False
+    ) -> List[Document]:
+        """Search for documents similar to an already embedded query."""
+        # With MMR, a larger candidate set (with vectors) is fetched and re-ranked
+        response = self.client.search(
+            index=self.index_name,
+            body=self._build_search_body(
+                query_vector,
+                self._fetch_size(limit),
+                filters,
+                with_vectors=include_vectors or self._use_mmr(limit)
+            ),
+            routing=self._search_routing(filters)
+        )
+        
+        hits = self._rerank(query_vector, response['hits']['hits'], limit)
+        self._hydrate(hits)
+        return self._to_documents(hits, include_vectors)
+    
     def delete(self, ids: List[str]) -> None:
-        """Delete documents by IDs."""
-        for doc_id in ids:
-            try:
-                self.client.delete(
-                    index=self.index_name,
-                    id=doc_id
-                )
-            except Exception as e:
-                # Log but don't fail if document doesn't exist
-                print(f"Warning: Could not delete document {doc_id}: {e}")
+        """Delete documents by IDs with batched _bulk requests."""
+        if self.routing_field:
+            # Routed documents live on an unknown shard, so delete them by id query
+            self.client.delete_by_query(
+                index=self.index_name,
+                body={"query": {"ids": {"values": list(ids)}}},
+                conflicts="proceed"
+            )
+            self.query_cache.clear()
+            return
+        
+        actions = (
+            {"_op_type": "delete", "_index": self.index_name, "_id": doc_id}
+            for doc_id in ids
+        )
+        _, errors = bulk(
+            self.client,
+            actions,
+            chunk_size=500,
+            request_timeout=120,
+            raise_on_error=False
+        )
+        self.query_cache.clear()
+        for error in errors:
+            # Log but don't fail if document doesn't exist
+            print(f"Warning: Could not delete document: {error}")
     
     def drop(self) -> None:
         """Drop the entire index."""
         if self.client.indices.exists(index=self.index_name):
             self.client.indices.delete(index=self.index_name)
+        self.query_cache.clear()
     
     def exists(self) -> bool:
         """Check if the index exists."""
@@ -224,13 +646,22 @@ class OpenSearchVectorDb(VectorDb):
         limit: int = 10,
         filters: Optional[Dict[str, Any]] = None
     ) -> List[Document]:
-        """Async search (currently just calls sync version)."""
-        return self.search(query, limit, filters)
+        """Async search; the blocking client call runs in a worker thread."""
+        return await asyncio.to_thread(self.search, query, limit, filters)
+    
+    async def abatch_search(
+        self,
+        queries: List[str],
+        limit: int = 10,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Document]]:
+        """Async batch search; the blocking client calls run in a worker thread."""
+        return await asyncio.to_thread(self.batch_search, queries, limit, filters)
     
     async def ainsert(self, documents: List[Document]) -> None:
-        """Async insert (currently just calls sync version)."""
-        self.insert(documents)
+        """Async insert; embedding and bulk requests run in a worker thread."""
+        await asyncio.to_thread(self.insert, documents)
     
     async def aupsert(self, documents: List[Document]) -> None:
-        """Async upsert (currently just calls sync version)."""
-        self.upsert(documents)
\ No newline at end of file
+        """Async upsert; embedding and bulk requests run in a worker thread."""
+        await asyncio.to_thread(self.upsert, documents)
\ No newline at end of file
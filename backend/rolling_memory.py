@@ -0,0 +1,48 @@
+# rolling_memory.py
+"""
+Memory V2 with a rolling session summary for Agno framework.
+The session summary is only regenerated every few runs, so the summary
+rendered into the system prompt stays byte-identical between refreshes and
+the Bedrock prompt cache keeps hitting. Agents pair it with a short
+history window that carries only the newest turns after the cached prefix.
+"""
+
+from typing import Optional
+from agno.memory.v2.memory import Memory
+from agno.memory.v2.schema import SessionSummary
+
+
+class RollingSummaryMemory(Memory):
+    """Memory whose session summaries are refreshed every `summary_interval` runs."""
+
+    def __init__(self, *args, summary_interval: int = 3, **kwargs):
+        """
+        Initialize rolling summary memory.
+
+        Args:
+            summary_interval: Runs between session summary refreshes
+        """
+        super().__init__(*args, **kwargs)
+        self.summary_interval = max(1, summary_interval)
+
+    def _current_summary(self, session_id: str, user_id: Optional[str]) -> Optional[SessionSummary]:
+        """Return the existing summary if it is not yet due for a refresh."""
+        summary = self.get_session_summary(session_id=session_id, user_id=user_id or "default")
+        if summary is None:
+            return None
+        run_count = len(self.runs.get(session_id, [])) if self.runs else 0
+        return None if run_count % self.summary_interval == 0 else summary
+
+    def create_session_summary(self, session_id: str, user_id: Optional[str] = None) -> Optional[SessionSummary]:
+        """Reuse the current summary between refreshes, otherwise regenerate it."""
+        summary = self._current_summary(session_id, user_id)
+        if summary is not None:
+            return summary
+        return super().create_session_summary(session_id=session_id, user_id=user_id)
+
+    async def acreate_session_summary(self, session_id: str, user_id: Optional[str] = None) -> Optional[SessionSummary]:
+        """Async variant of create_session_summary."""
+        summary = self._current_summary(session_id, user_id)
+        if summary is not None:
+            return summary
+        return await super().acreate_session_summary(session_id=session_id, user_id=user_id)
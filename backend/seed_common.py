@@ -0,0 +1,26 @@
+# seed_common.py
+"""
+Helpers shared by the seed scripts.
+"""
+
+import pymongo
+
+
+def create_seed_documentdb_client(url: str) -> pymongo.MongoClient:
+    """
+    Amazon DocumentDB client tuned for seeding.
+    
+    Seed data can be re-run, so writes skip waiting on replica/journal acknowledgement.
+    """
+    return pymongo.MongoClient(
+        url,
+        tls=True,
+        tlsCAFile="rds-ca-2019-root.pem",  # Download from AWS
+        retryWrites=False,  # DocumentDB doesn't support retryable writes
+        maxPoolSize=50,
+        minPoolSize=10,
+        serverSelectionTimeoutMS=10000,
+        w=1,
+        journal=False,
+        compressors="zlib"  # Stdlib codec, no extra dependency
+    )
@@ -9,6 +9,7 @@ import pymongo
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timezone
+from seed_common import create_seed_documentdb_client
 
 def seed_database():
     load_dotenv()
@@ -20,17 +21,15 @@ def seed_database():
     SESSION_COLLECTION = "agent_data"
     MEMORY_COLLECTION = "agent_memories"
 
+    # One timestamp for the whole seed run
+    NOW = datetime.now(timezone.utc)
+
     print("--- Starting DocumentDB Seeding ---")
 
     client = None
     try:
         # Connect to Amazon DocumentDB with SSL
-        client = pymongo.MongoClient(
-            DOCUMENTDB_URL,
-            ssl=True,
-            ssl_ca_certs='rds-ca-2019-root.pem',  # Download from AWS
-            retryWrites=False  # DocumentDB doesn't support retryable writes
-        )
+        client = create_seed_documentdb_client(DOCUMENTDB_URL)
         
         db = client[DATABASE_NAME]
         session_col = db[SESSION_COLLECTION]
@@ -55,8 +54,8 @@ def seed_database():
                     {"role": "user", "content": "The main points are the definition of confidential information and the term."},
                     {"role": "assistant", "content": "I'll analyze those sections against best practices and similar agreements in my knowledge base..."}
                 ],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
+                "created_at": NOW,
+                "updated_at": NOW
             },
             {
                 "_id": "session_compliance_check_456",
@@ -66,8 +65,8 @@ def seed_database():
                     {"role": "user", "content": "What are the GDPR compliance requirements for a small e-commerce website?"},
                     {"role": "assistant", "content": "Based on my knowledge of GDPR regulations, you need a clear privacy policy, lawful basis for processing, and data subject request handling procedures. Let me search for specific requirements..."}
                 ],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
+                "created_at": NOW,
+                "updated_at": NOW
             },
             {
                 "_id": "session_ip_consultation_789",
@@ -79,8 +78,8 @@ def seed_database():
                     {"role": "user", "content": "The invention is a software algorithm for data processing."},
                     {"role": "assistant", "content": "For software algorithms, you'll need to consider patentability requirements and disclosure implications. Let me search relevant case law and guidelines..."}
                 ],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
+                "created_at": NOW,
+                "updated_at": NOW
             }
         ]
 
@@ -96,8 +95,8 @@ def seed_database():
                     {"memory": "Has particular interest in data privacy and intellectual property matters."},
                     {"memory": "Frequently works on contract reviews and compliance assessments."}
                 ],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
+                "created_at": NOW,
+                "updated_at": NOW
             },
             {
                 "_id": "memories_user_john_smith",
@@ -108,8 +107,8 @@ def seed_database():
                     {"memory": "Business operates in the US but ships to EU customers, requiring GDPR compliance."},
                     {"memory": "Prefers actionable checklists and step-by-step guidance over lengthy legal analysis."}
                 ],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
+                "created_at": NOW,
+                "updated_at": NOW
             },
             {
                 "_id": "memories_user_startup_founder",
@@ -120,20 +119,20 @@ def seed_database():
                     {"memory": "Company is in Series A funding stage and needs IP portfolio development."},
                     {"memory": "Prefers strategic advice with business implications, not just legal theory."}
                 ],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
+                "created_at": NOW,
+                "updated_at": NOW
             }
         ]
 
         print(f"Inserting {len(session_docs)} session docs into '{SESSION_COLLECTION}'...")
-        session_col.insert_many(session_docs)
+        session_col.insert_many(session_docs, ordered=False)
 
         print(f"Inserting {len(memory_docs)} memory docs into '{MEMORY_COLLECTION}'...")
-        memory_col.insert_many(memory_docs)
+        memory_col.insert_many(memory_docs, ordered=False)
 
         print("Seed complete. Document counts:")
-        print(f"  - {SESSION_COLLECTION}: {session_col.count_documents({})}")
-        print(f"  - {MEMORY_COLLECTION}: {memory_col.count_documents({})}")
+        print(f"  - {SESSION_COLLECTION}: {session_col.estimated_document_count()}")
+        print(f"  - {MEMORY_COLLECTION}: {memory_col.estimated_document_count()}")
 
         # Test connection and basic operations
         print("\nTesting DocumentDB operations...")
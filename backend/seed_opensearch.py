@@ -6,23 +6,36 @@ Seed Amazon OpenSearch Service for the Legal Multi-Agent System:
 - Links with Amazon DocumentDB through document metadata
 """
 
+import io
 import os
 import json
+import time
 import uuid
+import queue
+import pickle
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 import boto3
 from opensearchpy import OpenSearch, RequestsHttpConnection
+from opensearchpy.helpers import streaming_bulk
 from requests_aws4auth import AWS4Auth
 
 # Document processing imports
 from agno.knowledge.pdf import PDFReader
 from agno.knowledge.docx import DocxReader
 from agno.knowledge.text import TextReader
+from aws_embedder import get_bedrock_client, normalize_embedding, trim_embedding
+from embedding_providers import get_embedding_provider
+from opensearch_serializer import CompactJSONSerializer
+from opensearch_vectordb import build_index_body
+from seed_common import create_seed_documentdb_client
 
 # MongoDB for cross-referencing
-import pymongo
+from pymongo import DeleteMany, ReplaceOne
 
 def create_knowledge_base_directories():
     """Create knowledge base directory structure if it doesn't exist."""
@@ -34,8 +47,8 @@ def create_knowledge_base_directories():
     
     return base_dir
 
-def create_sample_documents(base_dir: Path):
-    """Create sample legal documents for testing."""
+def create_sample_documents(base_dir: Path) -> dict:
+    """Create sample legal documents for testing, returning their contents by path."""
     
     # Sample legal texts
     sample_texts = {
@@ -143,34 +156,163 @@ Last Updated: 2024-01-15
     
     # Create sample text files
     texts_dir = base_dir / "texts"
+    sample_files = {}
     for filename, content in sample_texts.items():
-        (texts_dir / filename).write_text(content, encoding='utf-8')
+        file_path = texts_dir / filename
+        file_path.write_text(content, encoding='utf-8')
+        sample_files[file_path] = content
     
     print(f"Created {len(sample_texts)} sample legal documents in {texts_dir}")
+    return sample_files
 
-def generate_embeddings_bedrock(texts: list, region: str = "us-east-1") -> list:
-    """Generate embeddings using AWS Bedrock Titan Text Embeddings V2."""
-    bedrock_client = boto3.client('bedrock-runtime', region_name=region)
-    embeddings = []
+TITAN_MODEL_ID = "amazon.titan-embed-text-v2:0"
+
+def get_embed_model_id() -> str:
+    """Embedding model for seeding; EMBED_MODEL_ID may select a 1024-dim Cohere Embed model."""
+    return os.getenv("EMBED_MODEL_ID", TITAN_MODEL_ID)
+
+def generate_embeddings_bedrock(texts: list, region: str = "us-east-1", max_workers: int = 16) -> list:
+    """
+    Generate embeddings using AWS Bedrock, up to max_workers calls at a time.
     
-    for text in texts:
-        body = json.dumps({
-            "inputText": text,
-            "dimensions": 1024,
-            "normalize": True
-        })
-        
+    Titan Text Embeddings V2 (the default) takes one text per call; Cohere Embed
+    models take batches of up to 96 texts, so far fewer round-trips are made.
+    """
+    bedrock_client = get_bedrock_client(region)
+    provider = get_embedding_provider(get_embed_model_id())
+    
+    def embed_batch(batch: list) -> list:
         response = bedrock_client.invoke_model(
-            body=body,
-            modelId="amazon.titan-embed-text-v2:0",
+            body=provider.build_body(batch, "search_document"),
+            modelId=provider.model_id,
             accept="application/json",
             contentType="application/json"
         )
         
         response_body = json.loads(response.get('body').read())
-        embeddings.append(response_body['embedding'])
+        return provider.parse_embeddings(response_body)
+    
+    # Fan the calls out; map keeps input order
+    batch_size = provider.batch_size
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [embedding for embeddings in executor.map(embed_batch, batches) for embedding in embeddings]
+
+# Characters of chunk content sent to Titan (its input limit is 8192 tokens)
+EMBED_CONTENT_CHARS = 8000
+# Parsed reader output, keyed by file path and modification time
+READER_CACHE_DIR = Path("./.cache/readers")
+
+def read_documents_cached(reader, file_path: Path) -> list:
+    """Read and chunk a file, reusing the pickled result of an earlier run if the file is unchanged."""
+    stat = file_path.stat()
+    key = hashlib.blake2b(
+        f"{file_path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}:{type(reader).__name__}".encode("utf-8"),
+        digest_size=16
+    ).hexdigest()
+    cache_path = READER_CACHE_DIR / f"{key}.pkl"
+    
+    if cache_path.exists():
+        try:
+            with cache_path.open("rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable reader cache {cache_path}: {e}")
+    
+    documents = reader.read(file_path)
+    READER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with cache_path.open("wb") as f:
+        pickle.dump(documents, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return documents
+
+def bulk_index_worker(opensearch_client, index: str, docs_queue: queue.Queue, chunk_size: int, result: dict):
+    """Stream (doc_id, body) lists from the queue into OpenSearch _bulk requests until a None arrives."""
+    actions = (
+        {"_op_type": "index", "_index": index, "_id": doc_id, "_source": doc_body}
+        for file_docs in iter(docs_queue.get, None)
+        for doc_id, doc_body in file_docs
+    )
+    try:
+        for ok, item in streaming_bulk(
+            opensearch_client,
+            actions,
+            chunk_size=chunk_size,
+            max_chunk_bytes=10 * 1024 * 1024,
+            request_timeout=120,
+            raise_on_error=False
+        ):
+            if ok:
+                result["success"] += 1
+            else:
+                result["errors"].append(item)
+    except Exception as e:
+        result["exception"] = e
+        # Keep draining so the producer never blocks on a full queue
+        for _ in actions:
+            pass
+
+# Marks rows written by this script; uploads through the API are never touched by a reseed.
+# Seeds before the marker existed are recognised by their "doc_" id prefix.
+SEED_SOURCE = "seed"
+SEED_OWNED = {"$or": [{"source": SEED_SOURCE}, {"_id": {"$regex": "^doc_"}}]}
+
+def upsert_metadata_docs(collection, metadata_docs: list) -> tuple:
+    """
+    Write chunk metadata that is new or changed since the last seed and drop stale seeded chunks.
+    
+    Returns:
+        (written, unchanged, removed) document counts
+    """
+    stored_hashes = {
+        stored["_id"]: stored.get("content_hash")
+        for stored in collection.find(SEED_OWNED, {"content_hash": 1})
+    }
+    ops = [
+        ReplaceOne({"_id": mongo_doc["_id"]}, mongo_doc, upsert=True)
+        for mongo_doc in metadata_docs
+        if stored_hashes.get(mongo_doc["_id"]) != mongo_doc["content_hash"]
+    ]
+    unchanged = len(metadata_docs) - len(ops)
+    seeded_ids = {mongo_doc["_id"] for mongo_doc in metadata_docs}
+    stale_ids = [doc_id for doc_id in stored_hashes if doc_id not in seeded_ids]
+    if stale_ids:
+        ops.append(DeleteMany({"_id": {"$in": stale_ids}}))
+    
+    if not ops:
+        return 0, unchanged, 0
+    result = collection.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count, unchanged, result.deleted_count
+
+def rebuild_documents_summary(db) -> int:
+    """
+    Replace the seeded rows of documents_summary (one row per document, used for listing)
+    with the seeded chunks' totals; uploaded documents keep their rows.
     
-    return embeddings
+    Returns:
+        Number of summary rows written
+    """
+    summaries = list(db["knowledge_metadata"].aggregate([
+        {"$match": SEED_OWNED},
+        {
+            "$group": {
+                "_id": "$document_id",
+                "file_name": {"$first": "$file_name"},
+                "file_path": {"$first": "$file_path"},
+                "document_type": {"$first": "$document_type"},
+                "category": {"$first": "$category"},
+                "chunk_count": {"$sum": 1},
+                "created_at": {"$min": "$created_at"},
+                "updated_at": {"$max": "$updated_at"},
+                "total_content_length": {"$sum": "$content_length"}
+            }
+        },
+        {"$addFields": {"status": "indexed", "source": SEED_SOURCE}}
+    ]))
+    summary_col = db["documents_summary"]
+    summary_col.delete_many(SEED_OWNED)
+    if summaries:
+        summary_col.insert_many(summaries, ordered=False)
+    return len(summaries)
 
 def seed_opensearch_database():
     """Main function to seed OpenSearch with legal documents."""
@@ -185,6 +327,9 @@ def seed_opensearch_database():
     DOCUMENTDB_URL = os.getenv("DOCUMENTDB_URL", "mongodb://docdb-cluster.cluster-xyz.us-east-1.docdb.amazonaws.com:27017")
     DATABASE_NAME = os.getenv("DATABASE_NAME", "legal_agent_system")
     
+    # One timestamp for the whole seed run
+    NOW = datetime.now(timezone.utc)
+    
     print("--- Starting OpenSearch Vector Database Seeding ---")
     
     # Initialize AWS authentication
@@ -209,7 +354,8 @@ def seed_opensearch_database():
             http_auth=awsauth,
             use_ssl=True,
             verify_certs=True,
-            connection_class=RequestsHttpConnection
+            connection_class=RequestsHttpConnection,
+            serializer=CompactJSONSerializer()
         )
         print(f"Connected to OpenSearch at {OPENSEARCH_ENDPOINT}")
     except Exception as e:
@@ -218,12 +364,7 @@ def seed_opensearch_database():
     
     # Initialize DocumentDB for metadata storage
     try:
-        documentdb_client = pymongo.MongoClient(
-            DOCUMENTDB_URL,
-            ssl=True,
-            ssl_ca_certs="rds-ca-2019-root.pem",
-            retryWrites=False
-        )
+        documentdb_client = create_seed_documentdb_client(DOCUMENTDB_URL)
         db = documentdb_client[DATABASE_NAME]
         knowledge_metadata_col = db["knowledge_metadata"]
         print(f"Connected to DocumentDB at {DOCUMENTDB_URL}")
@@ -240,35 +381,16 @@ def seed_opensearch_database():
         except:
             pass
         
-        # Create new index with vector mapping
-        index_mapping = {
-            "mappings": {
-                "properties": {
-                    "vector": {
-                        "type": "knn_vector",
-                        "dimension": 1024,
-                        "method": {
-                            "name": "hnsw",
-                            "space_type": "cosinesimil",
-                            "engine": "nmslib"
-                        }
-                    },
-                    "content": {"type": "text"},
-                    "file_name": {"type": "keyword"},
-                    "document_type": {"type": "keyword"},
-                    "category": {"type": "keyword"},
-                    "chunk_index": {"type": "integer"},
-                    "mongo_doc_id": {"type": "keyword"},
-                    "created_at": {"type": "date"}
-                }
-            },
-            "settings": {
-                "index": {
-                    "knn": True,
-                    "knn.algo_param.ef_search": 512
-                }
+        # Create new index with the application's vector mapping
+        index_mapping = build_index_body(
+            settings={
+                # Bulk-load settings: no periodic refreshes, replicas or per-request
+                # translog fsyncs while seeding (restored once the load is done)
+                "refresh_interval": "-1",
+                "number_of_replicas": 0,
+                "translog.durability": "async"
             }
-        }
+        )
         
         opensearch_client.indices.create(
             index=OPENSEARCH_INDEX,
@@ -278,7 +400,7 @@ def seed_opensearch_database():
         
         # Create knowledge base directories and sample documents
         base_dir = create_knowledge_base_directories()
-        create_sample_documents(base_dir)
+        sample_files = create_sample_documents(base_dir)
         
         # Initialize document readers
         readers = {
@@ -287,9 +409,21 @@ def seed_opensearch_database():
             'txt': TextReader()
         }
         
-        opensearch_docs = []
         metadata_docs = []
-        doc_id_counter = 1
+        
+        # Upload to OpenSearch in a background thread while later files are still being embedded.
+        # Batches target ~1.5 MB bodies: each document is a ~4 KB 1024-dim vector plus a few keyword fields
+        chunk_size = max(10, min(100, int(1_500_000 / (1024 * 4 + 256))))
+        docs_queue = queue.Queue(maxsize=4)
+        bulk_result = {"success": 0, "errors": [], "exception": None}
+        bulk_writer = threading.Thread(
+            target=bulk_index_worker,
+            args=(opensearch_client, OPENSEARCH_INDEX, docs_queue, chunk_size, bulk_result),
+            daemon=True
+        )
+        bulk_writer.start()
+        upload_start = time.perf_counter()
+        print(f"Streaming documents into OpenSearch in batches of {chunk_size}...")
         
         # Process documents from each directory
         for doc_type, reader in readers.items():
@@ -304,109 +438,140 @@ def seed_opensearch_database():
                 'txt': ['.txt', '.md']
             }
             
-            for ext in extensions[doc_type]:
-                for file_path in doc_dir.glob(f"*{ext}"):
-                    try:
-                        print(f"Processing {file_path}")
+            # One directory listing per type; scandir entries carry the file type without a stat
+            exts = set(extensions[doc_type])
+            for entry in os.scandir(doc_dir):
+                if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in exts:
+                    continue
+                file_path = Path(entry.path)
+                try:
+                    print(f"Processing {file_path}")
+                    
+                    # Read and chunk document: samples from the text just written, other files cached across runs
+                    sample_content = sample_files.get(file_path)
+                    if sample_content is not None:
+                        sample_file = io.BytesIO(sample_content.encode("utf-8"))
+                        sample_file.name = file_path.name
+                        documents = reader.read(sample_file)
+                    else:
+                        documents = read_documents_cached(reader, file_path)
+                    
+                    # Generate embeddings using Bedrock, capped to the model's input limit
+                    contents = [doc.content[:EMBED_CONTENT_CHARS] for doc in documents]
+                    if not contents:
+                        continue
+                    
+                    embeddings = generate_embeddings_bedrock(contents, AWS_REGION)
+
+                    # IDs derive from the file path so re-seeding addresses the same documents
+                    file_key = uuid.uuid5(uuid.NAMESPACE_URL, str(file_path))
+                    
+                    opensearch_docs = []
+                    for i, doc in enumerate(documents):
+                        # Get pre-calculated embedding
+                        embedding = embeddings[i]
                         
-                        # Read and chunk document
-                        documents = reader.read(file_path)
+                        # Create stable IDs
+                        opensearch_doc_id = str(uuid.uuid5(file_key, str(i)))
+                        mongo_id = f"doc_{file_key.hex[:12]}_{i}"
                         
-                        # Generate embeddings using Bedrock
-                        contents = [doc.content for doc in documents]
-                        if not contents:
-                            continue
+                        # Create OpenSearch document (vector, filter fields and join key only)
+                        opensearch_doc = {
+                            "vector": trim_embedding(normalize_embedding(embedding)),
+                            "document_type": doc_type,
+                            "category": "general",
+                            "mongo_doc_id": mongo_id
+                        }
+                        opensearch_docs.append((opensearch_doc_id, opensearch_doc))
                         
-                        embeddings = generate_embeddings_bedrock(contents, AWS_REGION)
-
-                        for i, doc in enumerate(documents):
-                            # Get pre-calculated embedding
-                            embedding = embeddings[i]
-                            
-                            # Create unique IDs
-                            opensearch_doc_id = str(uuid.uuid4())
-                            mongo_id = f"doc_{doc_id_counter}_{i}"
-                            
-                            # Prepare metadata
-                            metadata = {
-                                "file_path": str(file_path),
-                                "file_name": file_path.name,
-                                "document_type": doc_type,
-                                "category": "general",
-                                "chunk_index": i,
-                                "total_chunks": len(documents),
-                                "mongo_doc_id": mongo_id,
-                                "opensearch_doc_id": opensearch_doc_id,
-                                "created_at": datetime.now(timezone.utc).isoformat()
-                            }
-                            
-                            # Add document-specific metadata if available
-                            if hasattr(doc, 'meta') and doc.meta:
-                                metadata.update(doc.meta)
-                            
-                            # Create OpenSearch document
-                            opensearch_doc = {
-                                "vector": embedding,
-                                "content": doc.content[:1000],  # Truncate for storage
-                                "file_name": file_path.name,
-                                "document_type": doc_type,
-                                "category": "general",
-                                "chunk_index": i,
-                                "mongo_doc_id": mongo_id,
-                                "created_at": metadata["created_at"]
-                            }
-                            opensearch_docs.append((opensearch_doc_id, opensearch_doc))
-                            
-                            # Prepare DocumentDB metadata document
-                            mongo_doc = {
-                                "_id": mongo_id,
-                                "opensearch_doc_id": opensearch_doc_id,
-                                "file_path": str(file_path),
-                                "file_name": file_path.name,
-                                "document_type": doc_type,
-                                "category": "general",
-                                "chunk_index": i,
-                                "total_chunks": len(documents),
-                                "content": doc.content,
-                                "content_length": len(doc.content),
-                                "metadata": metadata,
-                                "created_at": datetime.now(timezone.utc),
-                                "updated_at": datetime.now(timezone.utc)
-                            }
-                            metadata_docs.append(mongo_doc)
-                            
-                        doc_id_counter += 1
-                            
-                    except Exception as e:
-                        print(f"Error processing {file_path}: {e}")
-                        continue
-        
-        # Insert documents into OpenSearch
-        if opensearch_docs:
-            print(f"Inserting {len(opensearch_docs)} documents into OpenSearch...")
-            for doc_id, doc_body in opensearch_docs:
-                opensearch_client.index(
-                    index=OPENSEARCH_INDEX,
-                    id=doc_id,
-                    body=doc_body
-                )
-            print(f"Successfully inserted {len(opensearch_docs)} documents into OpenSearch")
+                        # Prepare DocumentDB metadata document
+                        mongo_doc = {
+                            "_id": mongo_id,
+                            "document_id": f"doc_{file_key.hex[:12]}",
+                            "source": SEED_SOURCE,
+                            "opensearch_doc_id": opensearch_doc_id,
+                            "file_path": str(file_path),
+                            "file_name": file_path.name,
+                            "document_type": doc_type,
+                            "category": "general",
+                            "chunk_index": i,
+                            "total_chunks": len(documents),
+                            "content": doc.content,
+                            "content_length": len(doc.content),
+                            # Only the reader's own metadata; the chunk fields are top level
+                            "metadata": doc.meta or {}
+                        }
+                        # Lets re-seeding skip chunks whose source is unchanged
+                        mongo_doc["content_hash"] = hashlib.blake2b(
+                            json.dumps(mongo_doc, sort_keys=True, default=str).encode("utf-8"),
+                            digest_size=16
+                        ).hexdigest()
+                        mongo_doc["created_at"] = NOW
+                        mongo_doc["updated_at"] = NOW
+                        metadata_docs.append(mongo_doc)
+                    
+                    # Hand the file's chunks to the bulk writer
+                    docs_queue.put(opensearch_docs)
+                        
+                except Exception as e:
+                    print(f"Error processing {file_path}: {e}")
+                    continue
         
-        # Insert metadata into DocumentDB
+        # Write metadata to DocumentDB while OpenSearch finishes loading and merging
+        metadata_executor = ThreadPoolExecutor(max_workers=1)
+        metadata_future = None
         if metadata_docs:
-            print(f"Inserting {len(metadata_docs)} metadata documents into DocumentDB...")
-            knowledge_metadata_col.delete_many({})  # Clear existing
-            knowledge_metadata_col.insert_many(metadata_docs)
-            print(f"Successfully inserted {len(metadata_docs)} metadata documents into DocumentDB")
+            print(f"Upserting {len(metadata_docs)} metadata documents into DocumentDB...")
+            metadata_future = metadata_executor.submit(upsert_metadata_docs, knowledge_metadata_col, metadata_docs)
+        metadata_executor.shutdown(wait=False)
+        
+        # Wait for the bulk writer to flush the remaining documents
+        docs_queue.put(None)
+        bulk_writer.join()
+        # Includes the embedding time the upload overlapped with
+        elapsed = time.perf_counter() - upload_start
+        batches = -(-(bulk_result["success"] + len(bulk_result["errors"])) // chunk_size)
+        print(f"Successfully inserted {bulk_result['success']} documents into OpenSearch in {batches} batches ({elapsed:.2f}s including embedding)")
+        if bulk_result["errors"]:
+            print(f"Failed to insert {len(bulk_result['errors'])} documents: {bulk_result['errors'][:3]}")
+        if bulk_result["exception"]:
+            print(f"OpenSearch bulk upload aborted: {bulk_result['exception']}")
+        
+        # Make the loaded documents visible, then merge the per-batch segments (and their
+        # HNSW graphs) into one before any replica exists, so only the merged segment is copied
+        opensearch_client.indices.refresh(index=OPENSEARCH_INDEX)
+        opensearch_client.indices.forcemerge(
+            index=OPENSEARCH_INDEX,
+            max_num_segments=1,
+            request_timeout=600
+        )
+        # Restore serving settings
+        opensearch_client.indices.put_settings(
+            index=OPENSEARCH_INDEX,
+            body={
+                "index": {
+                    "refresh_interval": "1s",
+                    "number_of_replicas": 1,
+                    "translog.durability": "request"
+                }
+            }
+        )
+        
+        if metadata_future is not None:
+            written, unchanged, removed = metadata_future.result()
+            print(f"DocumentDB metadata: {written} written, {unchanged} unchanged, {removed} removed")
+        
+        # The seed replaces the whole knowledge base, so the listing summary is rebuilt to match
+        print(f"DocumentDB documents_summary: {rebuild_documents_summary(db)} documents")
         
         # Verify collections
         opensearch_stats = opensearch_client.indices.stats(index=OPENSEARCH_INDEX)
-        documentdb_count = knowledge_metadata_col.count_documents({})
+        documentdb_count = knowledge_metadata_col.estimated_document_count()
         
         print(f"\n--- Seeding Complete ---")
         print(f"OpenSearch index '{OPENSEARCH_INDEX}' documents: {opensearch_stats['_all']['total']['docs']['count']}")
         print(f"DocumentDB 'knowledge_metadata' documents: {documentdb_count}")
-        print(f"Embedding model: amazon.titan-embed-text-v2:0")
+        print(f"Embedding model: {get_embed_model_id()}")
         print(f"Vector dimensions: 1024")
         
     except Exception as e:
@@ -0,0 +1,62 @@
+# unified_knowledge.py
+"""
+Single-pass knowledge base for Agno framework.
+Walks the knowledge directories once and dispatches each file to the
+PDF, DOCX or text reader by extension, instead of one knowledge base
+(and one directory walk) per document type.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Union
+from agno.document import Document
+from agno.document.chunking.fixed import FixedSizeChunking
+from agno.document.reader.base import Reader
+from agno.knowledge.agent import AgentKnowledge
+from agno.knowledge.pdf import PDFReader
+from agno.knowledge.docx import DocxReader
+from agno.knowledge.text import TextReader
+
+
+class UnifiedKnowledgeBase(AgentKnowledge):
+    """Knowledge base over mixed PDF/DOCX/text directories, read in one traversal."""
+
+    # Directories to walk (recursively)
+    paths: List[Union[str, Path]] = []
+    chunk_size: int = 1500
+    chunk_overlap: int = 200
+    # Files parsed concurrently
+    max_workers: int = 4
+
+    def _readers(self) -> Dict[str, Reader]:
+        """Map lowercase file extensions to readers sharing one chunking strategy."""
+        chunking = FixedSizeChunking(chunk_size=self.chunk_size, overlap=self.chunk_overlap)
+        pdf_reader = PDFReader(chunking_strategy=chunking)
+        docx_reader = DocxReader(chunking_strategy=chunking)
+        text_reader = TextReader(chunking_strategy=chunking)
+        return {
+            ".pdf": pdf_reader,
+            ".docx": docx_reader,
+            ".doc": docx_reader,
+            ".txt": text_reader,
+            ".md": text_reader,
+        }
+
+    def _iter_files(self, extensions) -> Iterator[Path]:
+        """Yield every supported file under the configured paths."""
+        for root_path in self.paths:
+            for root, _, file_names in os.walk(root_path):
+                for file_name in file_names:
+                    if os.path.splitext(file_name)[1].lower() in extensions:
+                        yield Path(root, file_name)
+
+    @property
+    def document_lists(self) -> Iterator[List[Document]]:
+        """Yield the chunked documents of each file, parsing files in parallel."""
+        readers = self._readers()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(
+                lambda path: readers[path.suffix.lower()].read(path),
+                self._iter_files(readers)
+            )
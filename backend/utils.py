@@ -1,19 +1,46 @@
 # utils.py
-from typing import Any, List, Dict, Tuple
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Iterable, List, Dict, Optional, Tuple
 from config import logger
 
-def _run_and_extract(agent_or_team, message: str, stream: bool = False) -> Tuple[Any, List[Dict[str, Any]]]:
+# Marks the end of a run stream handed over from its worker thread
+_STREAM_DONE = object()
+
+# Second of the last formatted timestamp, and its ISO 8601 string
+_iso_cache: Tuple[int, str] = (0, "")
+
+def now_iso() -> str:
+    """Current UTC time as ISO 8601 with second resolution, formatted once per second."""
+    global _iso_cache
+    second = int(time.time())
+    cached_second, cached = _iso_cache
+    if second != cached_second:
+        cached = datetime.fromtimestamp(second, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        _iso_cache = (second, cached)
+    return cached
+
+def _run_and_extract(
+    agent_or_team,
+    message: str,
+    stream: bool = False,
+    session_id: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> Tuple[Any, List[Dict[str, Any]]]:
     """
     Runs an agent or team and extracts content and tool calls.
     Enhanced to handle knowledge base integration.
     If stream=True, returns the iterable result.
+    The session and user are passed to the run rather than set on the agent beforehand.
     """
     try:
         # Log knowledge search activity
         if hasattr(agent_or_team, 'search_knowledge') and agent_or_team.search_knowledge:
             logger.info(f"Running agent with knowledge search enabled for query: {message[:100]}...")
         
-        run_result = agent_or_team.run(message, stream=stream)
+        run_result = agent_or_team.run(message, stream=stream, session_id=session_id, user_id=user_id)
         if stream:
             return run_result, []
     except TypeError:
@@ -22,16 +49,11 @@ def _run_and_extract(agent_or_team, message: str, stream: bool = False) -> Tuple
 
     # Handle single response object
     if hasattr(run_result, "content"):
-        content = getattr(run_result, "content", "") or ""
-        tool_calls = getattr(run_result, "tool_calls", []) or []
+        content = run_result.content or ""
+        tool_calls = getattr(run_result, "tool_calls", None) or []
         
-        # Extract knowledge sources if available
-        knowledge_sources = []
-        if hasattr(run_result, "knowledge_sources"):
-            knowledge_sources = getattr(run_result, "knowledge_sources", [])
-        elif hasattr(run_result, "references"):
-            # Alternative attribute name
-            knowledge_sources = getattr(run_result, "references", [])
+        # Extract knowledge sources if available ("references" is the alternative attribute name)
+        knowledge_sources = getattr(run_result, "knowledge_sources", None) or getattr(run_result, "references", None)
         
         # Log knowledge sources found
         if knowledge_sources:
@@ -41,99 +63,198 @@ def _run_and_extract(agent_or_team, message: str, stream: bool = False) -> Tuple
 
     # Handle iterable response for non-streaming calls
     if hasattr(run_result, "__iter__") and not isinstance(run_result, (str, bytes)):
-        content = ""
+        content_parts = []
         tool_calls = []
         knowledge_sources = []
         
+        # Each attribute is looked up once per event and reused
+        append_content = content_parts.append
         for ev in run_result:
-            if getattr(ev, "content", None):
-                content += ev.content
-            if getattr(ev, "tool_calls", None):
-                tool_calls.extend(ev.tool_calls)
-            if getattr(ev, "knowledge_sources", None):
-                knowledge_sources.extend(ev.knowledge_sources)
-            elif getattr(ev, "references", None):
-                knowledge_sources.extend(ev.references)
+            content = getattr(ev, "content", None)
+            if content:
+                append_content(content)
+            calls = getattr(ev, "tool_calls", None)
+            if calls:
+                tool_calls.extend(calls)
+            sources = getattr(ev, "knowledge_sources", None) or getattr(ev, "references", None)
+            if sources:
+                knowledge_sources.extend(sources)
         
-        return content, tool_calls
+        return "".join(content_parts), tool_calls
 
     # Fallback to a simple string conversion
     return str(run_result), []
 
-def extract_knowledge_metadata(knowledge_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+async def stream_run_content(
+    make_stream: Callable[[], Iterable[Any]],
+    flush_interval: float = 0.02,
+    max_chars: int = 4096
+) -> AsyncIterator[Any]:
     """
-    Extract metadata from knowledge search results for logging and tracking.
+    Iterate a blocking agent run stream in a worker thread and yield its content.
+    
+    Text chunks arriving within flush_interval seconds of the first buffered one
+    (up to max_chars) are joined, so each frame carries several tokens.
+    If the consumer stops early (e.g. the client disconnects), the worker
+    closes the run stream at its next chunk instead of draining it.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    
+    def produce() -> None:
+        stream = None
+        try:
+            stream = make_stream()
+            for chunk in stream:
+                if stop.is_set():
+                    break
+                content = getattr(chunk, "content", None)
+                if content:
+                    loop.call_soon_threadsafe(queue.put_nowait, content)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_DONE)
+    
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+    
+    buffer: List[str] = []
+    buffered_chars = 0
+    deadline = 0.0
+    try:
+        while True:
+            if buffer:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    yield "".join(buffer)
+                    buffer, buffered_chars = [], 0
+                    continue
+            else:
+                item = await queue.get()
+            
+            if item is _STREAM_DONE or isinstance(item, Exception):
+                break
+            if not isinstance(item, str):
+                # Structured content is passed through as its own frame
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, buffered_chars = [], 0
+                yield item
+                continue
+            
+            if not buffer:
+                deadline = loop.time() + flush_interval
+            buffer.append(item)
+            buffered_chars += len(item)
+            if buffered_chars >= max_chars:
+                yield "".join(buffer)
+                buffer, buffered_chars = [], 0
+        
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        # Signal the worker to stop when the consumer exits, normally or not
+        stop.set()
+    await producer
+    if isinstance(item, Exception):
+        raise item
+
+def summarize_knowledge(knowledge_results: List[Dict[str, Any]], top_n: int = 3) -> Tuple[Dict[str, Any], str]:
+    """
+    Summarize knowledge search results in a single pass.
+    
+    Returns the metadata for logging and tracking together with the sources text
+    for inclusion in agent responses (listing the first top_n results).
     """
     if not knowledge_results:
-        return {"sources": 0, "documents": [], "categories": []}
+        return {"sources": 0, "documents": [], "categories": []}, ""
     
     documents = []
     categories = set()
     document_types = set()
+    similarity_total = 0
+    source_lines = ["\n\n**Sources:**\n"]
     
-    for result in knowledge_results:
+    for i, result in enumerate(knowledge_results, 1):
+        get = result.get
+        similarity = get("similarity_score", 0)
+        chunk = get("chunk_index", 0)
+        similarity_total += similarity
         documents.append({
-            "file_name": result.get("file_name", ""),
-            "similarity_score": result.get("similarity_score", 0),
-            "chunk_index": result.get("chunk_index", 0)
+            "file_name": get("file_name", ""),
+            "similarity_score": similarity,
+            "chunk_index": chunk
         })
         
-        if result.get("category"):
-            categories.add(result["category"])
-        if result.get("document_type"):
-            document_types.add(result["document_type"])
+        category = get("category")
+        if category:
+            categories.add(category)
+        document_type = get("document_type")
+        if document_type:
+            document_types.add(document_type)
+        
+        if i <= top_n:
+            source_lines.append(f"{i}. {get('file_name', 'Unknown')} (chunk {chunk}, similarity: {similarity:.2f})\n")
     
-    return {
+    if len(knowledge_results) > top_n:
+        source_lines.append(f"... and {len(knowledge_results) - top_n} more sources\n")
+    
+    metadata = {
         "sources": len(knowledge_results),
         "documents": documents,
         "categories": list(categories),
         "document_types": list(document_types),
-        "avg_similarity": sum(r.get("similarity_score", 0) for r in knowledge_results) / len(knowledge_results)
+        "avg_similarity": similarity_total / len(knowledge_results)
     }
+    return metadata, "".join(source_lines)
+
+def extract_knowledge_metadata(knowledge_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Extract metadata from knowledge search results for logging and tracking.
+    Use summarize_knowledge when the sources text is needed as well.
+    """
+    return summarize_knowledge(knowledge_results)[0]
 
 def format_knowledge_sources_for_response(knowledge_results: List[Dict[str, Any]]) -> str:
     """
     Format knowledge sources for inclusion in agent responses.
+    Use summarize_knowledge when the metadata is needed as well.
     """
-    if not knowledge_results:
-        return ""
-    
-    sources_text = "\n\n**Sources:**\n"
-    for i, result in enumerate(knowledge_results[:3], 1):  # Limit to top 3
-        file_name = result.get("file_name", "Unknown")
-        similarity = result.get("similarity_score", 0)
-        chunk = result.get("chunk_index", 0)
-        
-        sources_text += f"{i}. {file_name} (chunk {chunk}, similarity: {similarity:.2f})\n"
-    
-    if len(knowledge_results) > 3:
-        sources_text += f"... and {len(knowledge_results) - 3} more sources\n"
-    
-    return sources_text
+    return summarize_knowledge(knowledge_results)[1]
+
+# Fields copied from each knowledge result into a cross-reference, with their defaults
+_CROSS_REFERENCE_DEFAULTS: Dict[str, Any] = {
+    "qdrant_point_id": "",
+    "mongo_doc_id": "",
+    "file_name": "",
+    "similarity_score": 0,
+    "chunk_index": 0,
+    "category": "",
+    "document_type": ""
+}
+_CROSS_REFERENCE_FIELDS = tuple(_CROSS_REFERENCE_DEFAULTS.items())
 
 def create_mongodb_cross_reference(session_id: str, knowledge_results: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Create cross-reference data for linking MongoDB session data with Qdrant knowledge results.
     """
-    cross_ref = {
+    knowledge_sources = []
+    append_source = knowledge_sources.append
+    for result in knowledge_results:
+        get = result.get
+        append_source({key: get(key, default) for key, default in _CROSS_REFERENCE_FIELDS})
+    
+    return {
         "session_id": session_id,
-        "knowledge_sources": [],
+        "knowledge_sources": knowledge_sources,
         "metadata": {
             "total_sources": len(knowledge_results),
-            "timestamp": str(datetime.now())
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
-    }
-    
-    for result in knowledge_results:
-        source_ref = {
-            "qdrant_point_id": result.get("qdrant_point_id", ""),
-            "mongo_doc_id": result.get("mongo_doc_id", ""),
-            "file_name": result.get("file_name", ""),
-            "similarity_score": result.get("similarity_score", 0),
-            "chunk_index": result.get("chunk_index", 0),
-            "category": result.get("category", ""),
-            "document_type": result.get("document_type", "")
-        }
-        cross_ref["knowledge_sources"].append(source_ref)
-    
-    return cross_ref
\ No newline at end of file
+    }
\ No newline at end of file
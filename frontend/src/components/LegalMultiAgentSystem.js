@@ -233,10 +233,13 @@ const LegalMultiAgentSystem = () => {
       const result = await response.json();
       console.log('Upload successful with AWS Bedrock embeddings:', result);
       
-      // Show success message
+      // Show success message (queued uploads are indexed in the background)
+      const processing = result.status === 'pending'
+        ? 'queued for indexing'
+        : `${result.chunks_created} chunks created`;
       setMessages(prev => [...prev, {
         id: Date.now(),
-        content: `✅ Document "${uploadFile.name}" uploaded successfully!\n• Processing: ${result.chunks_created} chunks created\n• Vector embeddings: AWS Bedrock Titan Text Embeddings V2\n• Storage: Amazon OpenSearch Service + DocumentDB\n• Document ID: ${result.document_id}`,
+        content: `✅ Document "${uploadFile.name}" uploaded successfully!\n• Processing: ${processing}\n• Vector embeddings: AWS Bedrock Titan Text Embeddings V2\n• Storage: Amazon OpenSearch Service + DocumentDB\n• Document ID: ${result.document_id}`,
         isBot: true,
         agent: 'Knowledge System',
         timestamp: new Date().toISOString()